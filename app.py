@@ -1,17 +1,20 @@
 import streamlit as st
 import pandas as pd
-import json
-import random
+import importlib.util
 import time
-import re
 import os
-import csv
+import queue
 from datetime import datetime
-from io import BytesIO
 
-from logic_tcm import load_questions, calculate_scores, get_diagnosis_result
-from logic_mapping import predict_mbti
-from utils_viz import plot_radar, plot_bar, generate_share_image
+from logic_tcm import load_questions, generate_random_answers
+from logic_model import warm_up_model
+from logic_ai_parse import parse_pasted_result
+from logic_pipeline import run_scale_pipeline, submit_scale_pipeline, result_cache_info
+from utils_viz import plot_radar, plot_bar, render_share_png, get_mbti_asset, warm_up_mbti_assets
+from utils_storage import EXPORT_FORMATS, get_research_store, get_research_writer
+from utils_state import encode_answers, decode_answers, get_checkpoint_store
+from utils_mbti import MBTI_TYPES
+from utils_metrics import timed, metrics_summary, render_prometheus, write_prometheus_file, start_metrics_server
 
 # ==========================================
 # 页面配置
@@ -26,29 +29,24 @@ st.set_page_config(
 # ==========================================
 # 0. 数据持久化 & URL同步模块 (新增)
 # ==========================================
-DATA_FILE = "research_data.csv"
 ADMIN_PASSWORD = "admin2026"
 
+# 提交后的加载动画模式 (环境变量配置)：
+#   staged  - 计算在后台线程执行，进度条随真实阶段推进 (默认)
+#   classic - 旧版赛博动画，计算同时在后台进行，动画总时长不超过 CYBERNJ_LOADING_MAX_SECONDS
+#   off     - 不显示动画，直接计算
+LOADING_MODE = os.environ.get("CYBERNJ_LOADING_MODE", "staged").strip().lower()
+LOADING_MAX_SECONDS = float(os.environ.get("CYBERNJ_LOADING_MAX_SECONDS", "2.5"))
 
-def init_csv_file():
-    """初始化数据文件"""
-    if not os.path.exists(DATA_FILE):
-        headers = [
-            "timestamp", "consent", "gender", "real_mbti",
-            "ai_mbti", "constitution_main",
-            "score_pinghe", "score_qixu", "score_yangxu", "score_yinxu",
-            "score_tanshi", "score_shire", "score_xueyu", "score_qiyu", "score_tebing",
-            "raw_answers_str"
-        ]
-        with open(DATA_FILE, mode='w', newline='', encoding='utf-8-sig') as f:
-            writer = csv.writer(f)
-            writer.writerow(headers)
+# 量表表单渲染模式 (环境变量配置)：
+#   scroll - 67 题全部放在一个滚动容器里 (默认)
+#   paged  - 按体质分页，每页只渲染一种体质的 7-8 道题，每次 rerun 传输的元素少得多 (适合移动端)
+FORM_MODE = os.environ.get("CYBERNJ_FORM_MODE", "scroll").strip().lower()
 
 
+@timed("save_research_data")
 def save_research_data(consent, gender, real_mbti, ai_mbti, main_const, scores, answers_list):
-    """保存数据到本地 CSV"""
-    init_csv_file()
-
+    """保存数据到研究数据库 (SQLite，列结构同旧版 CSV)，由后台线程批量落盘"""
     # 将答案列表压缩为字符串
     answers_str = "".join([str(x) for x in answers_list])
 
@@ -65,33 +63,64 @@ def save_research_data(consent, gender, real_mbti, ai_mbti, main_const, scores,
         answers_str
     ]
 
+    # 交给后台写入线程，立即返回；队列满时退回同步写入，保证不丢数据
+    # 打开数据库本身也可能失败 (目录只读、文件被锁或损坏)，一并放在 try 里
     try:
-        with open(DATA_FILE, mode='a', newline='', encoding='utf-8-sig') as f:
-            writer = csv.writer(f)
-            writer.writerow(row)
+        if get_research_writer().submit(row):
+            return
+        get_research_store().append(row)
     except Exception as e:
         st.error(f"数据保存失败: {e}")
 
 
 # --- URL 同步功能 (防丢失) ---
+def get_resume_token():
+    """
+    当前会话自己的续填码 (URL 参数 t，对应服务端存档)，首次调用时生成
+    不直接沿用 URL 里的 t：链接可能是别人分享的，共用一个码会看到对方的报告并覆盖对方的进度
+    """
+    if "resume_token" not in st.session_state:
+        st.session_state.resume_token = get_checkpoint_store().new_token()
+    return st.session_state.resume_token
+
+
 def update_url_from_state():
-    """将答案同步到 URL 参数"""
-    ans_str = ""
-    for i in range(67):
-        ans_str += str(st.session_state.get(f"q_{i}", 1))
-    st.query_params["d"] = ans_str
+    """
+    将答案同步到服务端存档和 URL 参数 (d 为 31 字符的压缩编码，见 utils_state；t 为续填码)
+    URL 没变时不写入，避免多余的浏览器历史记录
+    """
+    answers = [int(st.session_state.get(f"q_{i}", 1)) for i in range(67)]
+    token = get_resume_token()
+    get_checkpoint_store().save(token, answers)
+
+    params = {"d": encode_answers(answers), "t": token}
+    if any(st.query_params.get(k) != v for k, v in params.items()):
+        st.query_params.update(params)
 
 
 def load_state_from_url():
-    """从 URL 恢复答案"""
-    params = st.query_params
-    if "d" in params:
-        ans_str = params["d"]
-        if len(ans_str) == 67 and ans_str.isdigit():
-            for i, char in enumerate(ans_str):
-                st.session_state[f"q_{i}"] = int(char)
-            return True
-    return False
+    """
+    从 URL 恢复答案：优先读服务端存档 (t)，其次读 URL 中的答案编码 (d，兼容旧版 67 位数字串)
+    存档里有已完成的结果时直接恢复结果页，不再重新计分和绘制海报
+    """
+    store = get_checkpoint_store()
+    checkpoint = store.load(st.query_params.get("t"))
+    answers = checkpoint.answers if checkpoint is not None else None
+    if answers is None:
+        answers = decode_answers(st.query_params.get("d"))
+    if answers is None:
+        return False
+
+    for i, answer in enumerate(answers):
+        st.session_state[f"q_{i}"] = answer
+    if checkpoint is not None:
+        if checkpoint.result is not None:
+            st.session_state.tab1_result = {**checkpoint.result, "poster_png": None}
+        # 写时复制：存档复制到本会话自己的续填码下，之后的修改不会写回链接里的那一份
+        token = get_resume_token()
+        store.save(token, answers, result=checkpoint.result)
+        st.query_params.update({"t": token})
+    return True
 
 
 # ==========================================
@@ -193,60 +222,157 @@ FULL_SYSTEM_PROMPT = """
 
 
 # ==========================================
-# 辅助函数
+# 加载动画
 # ==========================================
-def parse_pasted_result(text):
-    try:
-        pattern = r"\[\[JSON_START\]\](.*?)\[\[JSON_END\]\]"
-        match = re.search(pattern, text, re.DOTALL)
-        if match:
-            json_str = match.group(1)
-        else:
-            start = text.find("{")
-            end = text.rfind("}") + 1
-            if start != -1 and end != -1:
-                json_str = text[start:end]
-            else:
-                return None, "未找到 JSON 数据格式，请确认 AI 输出正确。"
-        json_str = json_str.replace("```json", "").replace("```", "").strip()
-        data = json.loads(json_str)
-        return data, None
-    except Exception as e:
-        return None, f"解析出错: {str(e)}"
+LOADING_TEXTS = [
+    "📡 正在建立神经元与经络的连接...",
+    "🖐️ 赛博悬丝诊脉中，请保持呼吸平稳...",
+    "☯️ 正在解析您的阴阳虚实数据...",
+    "💊 神经网络正在抓取云端方剂...",
+    "🧠 正在由体质映射 MBTI 人格模型...",
+    "✅ 诊断完成，正在生成全息报告..."
+]
+
+# 每个阶段完成后进度条显示的文案 (对应 logic_pipeline.PIPELINE_STAGES)
+PIPELINE_STAGE_TEXTS = {
+    "scores": "☯️ 正在解析您的阴阳虚实数据...",
+    "diagnosis": "🧠 正在由体质映射 MBTI 人格模型...",
+    "mbti": "✅ 诊断完成，正在生成全息报告...",
+    "poster": "✅ 诊断完成，正在生成全息报告..."
+}
 
 
-# 加载动画函数
-def simulate_loading_animation():
+def simulate_loading_animation(max_seconds=LOADING_MAX_SECONDS):
     """
-    模拟赛博风格的加载过程
+    模拟赛博风格的加载过程 (总时长不超过 max_seconds)
     """
-    loading_texts = [
-        "📡 正在建立神经元与经络的连接...",
-        "🖐️ 赛博悬丝诊脉中，请保持呼吸平稳...",
-        "☯️ 正在解析您的阴阳虚实数据...",
-        "💊 神经网络正在抓取云端方剂...",
-        "🧠 正在由体质映射 MBTI 人格模型...",
-        "✅ 诊断完成，正在生成全息报告..."
-    ]
+    step_sleep = min(0.02, max_seconds * 0.8 / 100)
+    tail_sleep = min(0.5, max_seconds * 0.2)
 
     progress_bar = st.progress(0, text="启动赛博诊断程序...")
 
     for percent_complete in range(100):
-        time.sleep(0.02)  # 调整速度
-        text_index = int(percent_complete / (100 / len(loading_texts)))
-        if text_index < len(loading_texts):
-            current_text = loading_texts[text_index]
+        time.sleep(step_sleep)  # 调整速度
+        text_index = int(percent_complete / (100 / len(LOADING_TEXTS)))
+        if text_index < len(LOADING_TEXTS):
+            current_text = LOADING_TEXTS[text_index]
             progress_bar.progress(percent_complete + 1, text=current_text)
 
-    time.sleep(0.5)
+    time.sleep(tail_sleep)
+    progress_bar.empty()
+
+
+def run_pipeline_with_progress(answers):
+    """
+    运行量表计算流水线 (计分 -> 体质判定 -> MBTI -> 海报)，按 LOADING_MODE 显示进度
+    """
+    if LOADING_MODE == "off":
+        return run_scale_pipeline(answers)
+
+    if LOADING_MODE == "classic":
+        # 动画播放期间计算已在后台完成
+        future = submit_scale_pipeline(answers)
+        simulate_loading_animation()
+        return future.result()
+
+    # staged: 进度条只在真实阶段完成时推进
+    events = queue.Queue()
+    progress_bar = st.progress(0, text=LOADING_TEXTS[0])
+    future = submit_scale_pipeline(answers, on_stage=lambda stage, done, total: events.put((stage, done, total)))
+
+    while True:
+        try:
+            stage, done, total = events.get(timeout=0.05)
+        except queue.Empty:
+            if future.done():
+                break
+            continue
+        progress_bar.progress(int(done * 100 / total), text=PIPELINE_STAGE_TEXTS[stage])
+
     progress_bar.empty()
+    return future.result()
+
+
+# ==========================================
+# 量表表单
+# ==========================================
+def question_sections(questions_df):
+    """按体质把题目切成连续区间：[(体质, start, end), ...]"""
+    sections = []
+    for idx, t_type in enumerate(questions_df['type']):
+        if sections and sections[-1][0] == t_type:
+            sections[-1][2] = idx + 1
+        else:
+            sections.append([t_type, idx, idx + 1])
+    return [tuple(s) for s in sections]
+
+
+def render_question(idx, question, divider=True):
+    st.markdown(f"**{idx + 1}. {question}**")
+    st.radio(
+        "选项", [1, 2, 3, 4, 5],
+        captions=["没有", "很少", "有时", "经常", "总是"],
+        horizontal=True,
+        label_visibility="collapsed",
+        key=f"q_{idx}"
+    )
+    if divider:
+        st.divider()
+
+
+def render_scroll_form(questions_df):
+    """全部 67 题一次渲染，返回是否点击了提交"""
+    with st.form("scale_form"):
+        # 使用原生容器，解决顶部空白问题
+        with st.container(height=500, border=True):
+            for idx, row in questions_df.iterrows():
+                render_question(idx, row['question'])
+
+        return st.form_submit_button("🚀 提交并分析", type="primary", width="stretch")
+
+
+def render_paged_form(questions_df):
+    """按体质分页渲染，只有最后一页有提交按钮；返回是否点击了提交"""
+    # 不在当前页的 radio 不会渲染，Streamlit 会在 rerun 结束时清理它们的 q_* 状态；
+    # 每次 rerun 先把已有答案重新赋值一次，转为普通会话状态保留下来
+    for idx in range(len(questions_df)):
+        key = f"q_{idx}"
+        if key in st.session_state:
+            st.session_state[key] = st.session_state[key]
+
+    sections = question_sections(questions_df)
+    page = min(st.session_state.get("form_page", 0), len(sections) - 1)
+    t_type, start, end = sections[page]
+    is_last = page == len(sections) - 1
+
+    st.progress((page + 1) / len(sections), text=f"第 {page + 1}/{len(sections)} 部分：{t_type}")
+    with st.form("scale_form"):
+        for idx in range(start, end):
+            render_question(idx, questions_df.at[idx, 'question'], divider=False)
+
+        c_prev, c_next = st.columns(2)
+        with c_prev:
+            go_prev = st.form_submit_button("⬅️ 上一部分", disabled=page == 0, width="stretch")
+        with c_next:
+            if is_last:
+                submitted = st.form_submit_button("🚀 提交并分析", type="primary", width="stretch")
+            else:
+                submitted = False
+                go_next = st.form_submit_button("下一部分 ➡️", type="primary", width="stretch")
+
+    if go_prev or (not is_last and go_next):
+        st.session_state.form_page = page - 1 if go_prev else page + 1
+        # 翻页时顺便保存进度
+        update_url_from_state()
+        st.rerun()
+    return submitted
 
 
 # ==========================================
 # 核心交互：数据收集弹窗 (Dialog) - 新增
 # ==========================================
 @st.dialog("🧬 数据捐赠计划 (Data Donation)")
-def show_consent_dialog(scores, main_diagnosis, mbti_pred, elements, answers_net):
+def show_consent_dialog(scores, main_diagnosis, mbti_pred, elements, answers_net, poster_png=None):
     st.markdown("""
     **您是否愿意将本次匿名测试数据提供给后续课题研究？**
 
@@ -267,8 +393,7 @@ def show_consent_dialog(scores, main_diagnosis, mbti_pred, elements, answers_net
         with c1:
             gender = st.selectbox("您的性别", ["男", "女"], index=0)
         with c2:
-            mbti_options = ["不清楚", "ISTJ", "ISFJ", "INFJ", "INTJ", "ISTP", "ISFP", "INFP", "INTP",
-                            "ESTP", "ESFP", "ENFP", "ENTP", "ESTJ", "ESFJ", "ENFJ", "ENTJ"]
+            mbti_options = ["不清楚"] + MBTI_TYPES
             real_mbti = st.selectbox("您真实的 MBTI (如有)", mbti_options, index=0)
 
     st.divider()
@@ -291,14 +416,32 @@ def show_consent_dialog(scores, main_diagnosis, mbti_pred, elements, answers_net
             "scores": scores,
             "main_diagnosis": main_diagnosis,
             "mbti": mbti_pred,
-            "elements": elements
+            "elements": elements,
+            "poster_png": poster_png
         }
+        # 3. 存档结果，换浏览器 / 刷新后凭续填码直接恢复
+        get_checkpoint_store().save(get_resume_token(), answers_net, result=st.session_state.tab1_result)
         st.rerun()
 
 
 # ==========================================
 # 初始化逻辑 - 新增
 # ==========================================
+@st.cache_resource(show_spinner=False)
+def warm_up_resources():
+    """
+    进程级预热 (所有会话共享，只执行一次)：加载 MBTI 模型并跑一次前向、预先解码 MBTI 原型图、按配置启动指标端点
+    部署后的第一位用户不再承担 torch.load 的耗时
+    """
+    return {
+        "model": warm_up_model(),
+        "mbti_assets": warm_up_mbti_assets(),
+        "metrics_server": start_metrics_server(),
+    }
+
+
+warm_up_info = warm_up_resources()
+
 if "data_loaded" not in st.session_state:
     if load_state_from_url():
         st.toast("已恢复上次填写进度", icon="📂")
@@ -328,17 +471,80 @@ with st.sidebar:
     with st.expander("🔐 管理员模式 (Admin)"):
         pwd = st.text_input("输入管理员密码", type="password")
         if pwd == ADMIN_PASSWORD:
-            if os.path.exists(DATA_FILE):
-                with open(DATA_FILE, "r", encoding="utf-8-sig") as f:
-                    st.download_button(
-                        label="📥 下载收集的数据 (CSV)",
-                        data=f,
-                        file_name=f"research_data_{datetime.now().strftime('%Y%m%d')}.csv",
-                        mime="text/csv"
-                    )
+            store = get_research_store()
+            # 行数取自聚合表 (COUNT(*) 在 SQLite 中是全表扫描)
+            stats = store.get_stats()
+            if stats["n"] > 0:
+                # 导出筛选条件 (文件只在点击下载时才分块生成)
+                date_range = st.date_input("日期范围 (可选)", value=())
+                consent_filter = st.selectbox("知情同意", ["全部", "仅同意", "仅拒绝"])
+                export_formats = ["csv", "csv.gz"] + (["parquet"] if importlib.util.find_spec("pyarrow") else [])
+                export_fmt = st.selectbox("导出格式", export_formats)
+
+                export_filters = {
+                    "start_date": date_range[0] if len(date_range) > 0 else None,
+                    "end_date": date_range[1] if len(date_range) > 1 else None,
+                    "consent": {"全部": None, "仅同意": True, "仅拒绝": False}[consent_filter],
+                }
+                ext, mime = EXPORT_FORMATS[export_fmt]
+                st.download_button(
+                    label=f"📥 下载收集的数据 ({export_fmt.upper()})",
+                    data=lambda: store.export_bytes(export_fmt, **export_filters),
+                    file_name=f"research_data_{datetime.now().strftime('%Y%m%d')}{ext}",
+                    mime=mime
+                )
             else:
                 st.warning("暂无数据文件")
 
+            # 📈 实时统计 (来自增量聚合表，与历史数据量无关)
+            if stats["n"] > 0:
+                st.markdown("**📈 实时统计**")
+                m1, m2 = st.columns(2)
+                m1.metric("累计提交", stats["n"])
+                m2.metric("AI/真实 MBTI 一致率",
+                          f"{stats['agreement']:.1%}" if stats["agreement"] is not None else "—")
+                st.bar_chart(pd.Series(stats["constitution"], name="人数"), horizontal=True)
+                st.caption("各性别平均体质得分")
+                st.dataframe(pd.DataFrame(stats["score_mean"]).round(1))
+                if stats["confusion"]:
+                    st.caption("真实 MBTI (行) × AI 预测 (列)")
+                    confusion = pd.Series(stats["confusion"]).unstack(fill_value=0)
+                    st.dataframe(confusion)
+
+            writer_stats = get_research_writer().stats
+            st.caption(
+                f"写入队列：待写 {get_research_writer().pending()} · 已写 {writer_stats['written']} · "
+                f"排队等待 {writer_stats['backpressure']} · 转同步写入 {writer_stats['rejected']} · "
+                f"失败 {writer_stats['errors']} · 关闭时未写入 {writer_stats['dropped']}"
+            )
+
+            cache_info = result_cache_info()
+            st.caption(
+                f"结果缓存：命中 {cache_info['hits']} · 未命中 {cache_info['misses']} · "
+                f"条目 {cache_info['entries']}/{cache_info['max_entries']} · 淘汰 {cache_info['evictions']}"
+            )
+
+            model_info = warm_up_info["model"]
+            st.caption(
+                f"MBTI 模型：{model_info['backend']}"
+                + (f"/{model_info['variant']}" if model_info["variant"] else "") + " · "
+                + (f"加载 {model_info['load_seconds'] or 0:.2f}s · 预热前向 {model_info['warmup_seconds'] * 1000:.1f}ms"
+                   if model_info["loaded"] else "未加载 (使用备用映射)")
+            )
+
+            # ⏱️ 各阶段耗时 (本进程启动以来)
+            perf = metrics_summary()
+            if perf:
+                st.markdown("**⏱️ 各阶段耗时 (ms)**")
+                st.dataframe(pd.DataFrame(perf).T)
+                write_prometheus_file()
+                st.download_button(
+                    label="📥 导出指标 (Prometheus)",
+                    data=render_prometheus(),
+                    file_name=f"cybernj_metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.prom",
+                    mime="text/plain"
+                )
+
     st.caption("""
     © 2026 CyberNJ Team. All Rights Reserved.
 
@@ -377,22 +583,14 @@ tab1, tab2 = st.tabs(["📋 量表测评 (Standard Scale)", "🤖 AI 问诊 (Hum
 with tab1:
     col_info, col_btn = st.columns([3, 1])
     with col_info:
-        st.info("💡 请在下方滚动窗口中完成 67 道题目。")
+        if FORM_MODE == "paged":
+            st.info("💡 题目按体质分为 9 部分，请逐页完成 67 道题目。")
+        else:
+            st.info("💡 请在下方滚动窗口中完成 67 道题目。")
     with col_btn:
         # 随机填表功能
         if st.button("🎲 随机一键填表", type="secondary"):
-            target_type_index = random.randint(0, 8)
-            base_answers = []
-            for _ in range(67):
-                if random.random() < 0.8:
-                    base_answers.append(random.randint(1, 2))
-                else:
-                    base_answers.append(3)
-
-            slices_indices = [(0, 7), (7, 15), (15, 23), (23, 31), (31, 38), (38, 45), (45, 52), (52, 59), (59, 67)]
-            start, end = slices_indices[target_type_index]
-            for i in range(start, end):
-                base_answers[i] = random.randint(4, 5)
+            base_answers = generate_random_answers()
 
             for i in range(67):
                 st.session_state[f"q_{i}"] = base_answers[i]
@@ -404,49 +602,24 @@ with tab1:
     questions_df = load_questions()
 
     if questions_df is not None:
-        with st.form("scale_form"):
-            # 使用原生容器，解决顶部空白问题
-            with st.container(height=500, border=True):
-                for idx, row in questions_df.iterrows():
-                    st.markdown(f"**{idx + 1}. {row['question']}**")
-                    st.radio(
-                        "选项", [1, 2, 3, 4, 5],
-                        captions=["没有", "很少", "有时", "经常", "总是"],
-                        horizontal=True,
-                        label_visibility="collapsed",
-                        key=f"q_{idx}"
-                    )
-                    st.divider()
-
-            submitted = st.form_submit_button("🚀 提交并分析", type="primary", width="stretch")
+        if FORM_MODE == "paged":
+            submitted = render_paged_form(questions_df)
+        else:
+            submitted = render_scroll_form(questions_df)
 
         # 🟢 处理提交逻辑
         if submitted:
             # 🔥 1. 先把当前进度同步到 URL (防止此时用户刷新丢失)
             update_url_from_state()
 
-            # 调用加载动画
-            simulate_loading_animation()
-
-            answers_for_logic_tcm = []
-            answers_for_neural_net = []
-
-            for idx, row in questions_df.iterrows():
-                val = st.session_state.get(f"q_{idx}", 1)
-                answers_for_logic_tcm.append({
-                    "type": row['type'],
-                    "score": val,
-                    "direction": row.get('direction', 1)
-                })
-                answers_for_neural_net.append(int(val))
-
-            scores = calculate_scores(pd.DataFrame(answers_for_logic_tcm))
-            main_diagnosis = get_diagnosis_result(scores)
+            answers_for_neural_net = [int(st.session_state.get(f"q_{idx}", 1)) for idx in range(len(questions_df))]
 
-            mbti, elements = predict_mbti(constitution_scores=scores, answers=answers_for_neural_net)
+            # 计分、MBTI 推理与海报渲染在后台线程执行，进度条随阶段推进
+            result = run_pipeline_with_progress(answers_for_neural_net)
 
             # 🔥 触发弹窗 (而不是直接设置 session_state.tab1_result)
-            show_consent_dialog(scores, main_diagnosis, mbti, elements, answers_for_neural_net)
+            show_consent_dialog(result["scores"], result["main_diagnosis"], result["mbti"], result["elements"],
+                                answers_for_neural_net, poster_png=result["poster_png"])
 
         # 🟢 结果展示区域
         if st.session_state.tab1_result:
@@ -465,9 +638,9 @@ with tab1:
                 plot_bar(res["scores"])
             with col_b:
                 st.subheader(f"🧠 MBTI人格映射：{res['mbti']} ")
-                img_path = f"assets/mbti/{res['mbti']}.png"
-                if os.path.exists(img_path):
-                    st.image(img_path, caption=f"MBTI Archetype: {res['mbti']}", width=200)
+                mbti_asset = get_mbti_asset(res['mbti'])
+                if mbti_asset is not None and mbti_asset.preview_png is not None:
+                    st.image(mbti_asset.preview_png, caption=f"MBTI Archetype: {res['mbti']}", width=200)
                 else:
                     st.info(f"（提示：请在 assets/mbti/ 放入 {res['mbti']}.png 以显示图片）")
                 st.write("🌌 **五行能量雷达**")
@@ -475,17 +648,17 @@ with tab1:
 
             st.divider()
             st.subheader("📤 生成诊断报告")
-            share_img = generate_share_image(res["main_diagnosis"], res["mbti"], res["scores"], res["elements"])
-            buf = BytesIO()
-            share_img.save(buf, format="PNG")
+            poster_png = res.get("poster_png") or render_share_png(
+                res["main_diagnosis"], res["mbti"], res["scores"], res["elements"]
+            )
 
             c_img, c_dl = st.columns([1, 2])
             with c_img:
-                st.image(share_img, caption="预览图", width=150)
+                st.image(poster_png, caption="预览图", width=150)
             with c_dl:
                 st.download_button(
                     label="💾 下载高清诊断单 (PNG)",
-                    data=buf.getvalue(),
+                    data=poster_png,
                     file_name=f"CyberNJ_Report_{res['mbti']}.png",
                     mime="image/png",
                     type="primary"
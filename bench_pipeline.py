@@ -0,0 +1,132 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import resource
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from io import BytesIO
+
+import numpy as np
+
+from logic_tcm import load_question_bank, calculate_scores_vectorized, get_diagnosis_result, generate_random_answers
+from logic_mapping import predict_mbti
+from utils_viz import generate_share_image
+
+# ==========================================
+# 量表流水线压测 (无需浏览器)
+# ==========================================
+# 用法：python bench_pipeline.py --requests 500 --concurrency 8 --output bench.json
+# 每个请求依次执行：计分 -> 主导体质 -> MBTI -> 海报绘制 -> PNG 编码，
+# 分阶段统计 p50/p95/p99 延迟、吞吐量与峰值 RSS，输出 JSON 便于跨提交对比。
+STAGES = ["calculate_scores", "get_diagnosis_result", "predict_mbti", "generate_share_image", "png_encode"]
+
+
+def run_one(answers, spec):
+    """执行一次完整流水线，返回 {阶段: 耗时秒}"""
+    timings = {}
+
+    t0 = time.perf_counter()
+    scores = calculate_scores_vectorized(answers, spec)
+    t1 = time.perf_counter()
+    main_diagnosis = get_diagnosis_result(scores)
+    t2 = time.perf_counter()
+    mbti, elements = predict_mbti(constitution_scores=scores, answers=answers)
+    t3 = time.perf_counter()
+    img = generate_share_image(main_diagnosis, mbti, scores, elements)
+    t4 = time.perf_counter()
+    buf = BytesIO()
+    img.save(buf, format="PNG")
+    t5 = time.perf_counter()
+
+    for stage, start, end in zip(STAGES, (t0, t1, t2, t3, t4), (t1, t2, t3, t4, t5)):
+        timings[stage] = end - start
+    timings["total"] = t5 - t0
+    return timings
+
+
+def summarize(samples):
+    """毫秒为单位的分位数统计"""
+    arr = np.asarray(samples) * 1000
+    return {
+        "count": int(arr.size),
+        "mean_ms": round(float(arr.mean()), 3),
+        "p50_ms": round(float(np.percentile(arr, 50)), 3),
+        "p95_ms": round(float(np.percentile(arr, 95)), 3),
+        "p99_ms": round(float(np.percentile(arr, 99)), 3),
+        "max_ms": round(float(arr.max()), 3),
+    }
+
+
+def peak_rss_mb():
+    # Linux 下 ru_maxrss 单位为 KB，macOS 为字节
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL,
+                                       text=True).strip()
+    except Exception:
+        return None
+
+
+def run_benchmark(n_requests=200, concurrency=4, warmup=5, seed=2026):
+    rng = random.Random(seed)
+    workload = [generate_random_answers(rng) for _ in range(n_requests)]
+    spec = load_question_bank().spec
+
+    # 预热：加载题库、模型、字体等一次性资源，不计入统计
+    for answers in workload[:warmup]:
+        run_one(answers, spec)
+
+    results = []
+    results_lock = threading.Lock()
+
+    def _task(answers):
+        timings = run_one(answers, spec)
+        with results_lock:
+            results.append(timings)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(_task, workload))
+    wall = time.perf_counter() - start
+
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "config": {
+            "requests": n_requests, "concurrency": concurrency, "warmup": warmup, "seed": seed,
+            "model_backend": os.environ.get("CYBERNJ_MODEL_BACKEND", "torch"),
+            "cpu_count": os.cpu_count(),
+        },
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(n_requests / wall, 2) if wall > 0 else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": {stage: summarize([r[stage] for r in results]) for stage in STAGES + ["total"]},
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="量表流水线压测")
+    parser.add_argument('--requests', type=int, default=200, help="请求总数")
+    parser.add_argument('--concurrency', type=int, default=4, help="并发线程数")
+    parser.add_argument('--warmup', type=int, default=5, help="预热请求数 (不计入统计)")
+    parser.add_argument('--seed', type=int, default=2026)
+    parser.add_argument('--output', default=None, help="JSON 输出文件 (默认打印到标准输出)")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.requests, args.concurrency, args.warmup, args.seed)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"✅ 压测结果已写入 {args.output}")
+    else:
+        print(text)
\ No newline at end of file
@@ -0,0 +1,149 @@
+import json
+from collections import namedtuple
+
+from utils_mbti import MBTI_TYPES
+
+# ==========================================
+# AI 问诊结果解析 (AI 问诊页粘贴的聊天记录 -> 可视化数据)
+# ==========================================
+# 粘贴内容可能是几百 KB 的完整对话 (甚至包含提示词里的示例 JSON)，解析只做 C 层面的 find / rfind：
+#   1. 取最后一个 [[JSON_START]] 与其后的 [[JSON_END]] 之间的内容
+#   2. 没有标记时，以最后一个 "diagnosis_scores" 为锚点向前做括号配平，找到外层 { 后 raw_decode
+# 逐字符扫描只发生在锚点之前 MAX_JSON_CHARS 的窗口内，任何输入的耗时都有上界
+JSON_START = "[[JSON_START]]"
+JSON_END = "[[JSON_END]]"
+ANCHOR_KEY = '"diagnosis_scores"'
+
+MAX_PASTE_CHARS = 1_000_000  # 粘贴内容上限
+MAX_JSON_CHARS = 20_000  # JSON 数据块上限
+
+CONSTITUTION_KEYS = ["平和质", "气虚质", "阳虚质", "阴虚质", "痰湿质", "湿热质", "血瘀质", "气郁质", "特禀质"]
+ELEMENT_KEYS = ["木", "火", "土", "金", "水"]
+
+
+class ParseError(namedtuple('ParseError', ['code', 'message', 'field'])):
+    """
+    结构化的解析错误
+    code: too_large / not_found / invalid_json / schema；field: 出错的字段 (可能为 None)
+    """
+
+    def __str__(self):
+        return self.message
+
+
+def _error(code, message, field=None):
+    return None, ParseError(code, message, field)
+
+
+def _strip_fences(json_str):
+    return json_str.replace("```json", "").replace("```", "").strip()
+
+
+def _extract_sentinel_block(text):
+    """返回最后一对标记之间的内容；没有完整标记时返回 None"""
+    start = text.rfind(JSON_START)
+    if start == -1:
+        return None
+    start += len(JSON_START)
+    end = text.find(JSON_END, start)
+    if end == -1:
+        return None
+    return text[start:end]
+
+
+def _find_enclosing_object_start(text, anchor):
+    """从 anchor 向前配平花括号，返回包住 anchor 的最外层 { 的位置；窗口内找不到时返回 -1"""
+    depth = 0
+    lower = max(0, anchor - MAX_JSON_CHARS)
+    for i in range(anchor - 1, lower - 1, -1):
+        ch = text[i]
+        if ch == "}":
+            depth += 1
+        elif ch == "{":
+            if depth == 0:
+                return i
+            depth -= 1
+    return -1
+
+
+def _number_map(value, keys, field):
+    """校验 {键: 0-100 的数字}，返回 (规范化后的字典, 错误)"""
+    if not isinstance(value, dict):
+        return None, ParseError("schema", f"{field} 应为对象", field)
+    missing = [k for k in keys if k not in value]
+    if missing:
+        return None, ParseError("schema", f"{field} 缺少字段: {', '.join(missing)}", field)
+
+    result = {}
+    for k in keys:
+        v = value[k]
+        if isinstance(v, bool) or not isinstance(v, (int, float)) or not 0 <= v <= 100:
+            return None, ParseError("schema", f"{field}.{k} 应为 0-100 的数字，实际为 {v!r}", f"{field}.{k}")
+        result[k] = v
+    return result, None
+
+
+def validate_result(data):
+    """
+    校验 AI 输出的数据结构，返回 (规范化后的 dict, None) 或 (None, ParseError)
+    规范化：只保留九种体质与五行的已知键，MBTI 转为大写
+    """
+    if not isinstance(data, dict):
+        return _error("schema", "JSON 顶层应为对象")
+
+    scores, err = _number_map(data.get("diagnosis_scores"), CONSTITUTION_KEYS, "diagnosis_scores")
+    if err:
+        return None, err
+    elements, err = _number_map(data.get("five_elements"), ELEMENT_KEYS, "five_elements")
+    if err:
+        return None, err
+
+    mbti = data.get("predicted_mbti")
+    if not isinstance(mbti, str) or mbti.strip().upper() not in MBTI_TYPES:
+        return _error("schema", f"predicted_mbti 不是有效的 MBTI 类型: {mbti!r}", "predicted_mbti")
+
+    summary = data.get("analysis_summary", "")
+    if not isinstance(summary, str):
+        return _error("schema", "analysis_summary 应为字符串", "analysis_summary")
+
+    return {
+        "diagnosis_scores": scores,
+        "predicted_mbti": mbti.strip().upper(),
+        "five_elements": elements,
+        "analysis_summary": summary,
+    }, None
+
+
+def parse_pasted_result(text):
+    """
+    从粘贴的文本中提取并校验 AI 诊断 JSON
+    返回 (data, None) 或 (None, ParseError)；ParseError 转为字符串即为可展示的中文提示
+    """
+    if not text:
+        return _error("not_found", "未找到 JSON 数据格式，请确认 AI 输出正确。")
+    if len(text) > MAX_PASTE_CHARS:
+        return _error("too_large", f"粘贴内容过长 (超过 {MAX_PASTE_CHARS // 1000}K 字符)，请只粘贴 AI 最后输出的 JSON 部分。")
+
+    block = _extract_sentinel_block(text)
+    if block is not None:
+        json_str = _strip_fences(block)
+        if len(json_str) > MAX_JSON_CHARS:
+            return _error("too_large", "JSON 数据块过长，请确认 AI 输出正确。")
+        try:
+            data = json.loads(json_str)
+        except (ValueError, RecursionError) as e:
+            return _error("invalid_json", f"解析出错: {e}")
+        return validate_result(data)
+
+    anchor = text.rfind(ANCHOR_KEY)
+    if anchor == -1:
+        return _error("not_found", "未找到 JSON 数据格式，请确认 AI 输出正确。")
+    start = _find_enclosing_object_start(text, anchor)
+    if start == -1:
+        return _error("not_found", "未找到完整的 JSON 对象，请确认 AI 输出正确。")
+
+    try:
+        data, _ = json.JSONDecoder().raw_decode(text[start:start + MAX_JSON_CHARS])
+    except (ValueError, RecursionError) as e:
+        return _error("invalid_json", f"解析出错: {e}")
+    return validate_result(data)
\ No newline at end of file
@@ -0,0 +1,121 @@
+import os
+from functools import lru_cache
+
+import numpy as np
+
+# ==============================================================================
+# 五行计算引擎 (9 种体质 -> 木火土金水，单条与批量共用同一套权重和公式)
+# ==============================================================================
+# 两种计分方案：
+#   linear   - 线性映射后截断到 10-95 (量表结果页 / 海报使用，默认)
+#   enhanced - 阈值抑制底噪 + 幂函数拉伸 + 按行动态缩放到 20-95，雷达图差异更明显
+ELEMENTS_VARIANT = os.environ.get("CYBERNJ_ELEMENTS_VARIANT", "linear").strip().lower()
+
+# 输入列顺序 (与 logic_model.SCORE_ORDER 相同)
+ELEMENT_SCORE_ORDER = ['平和质', '气虚质', '阳虚质', '阴虚质', '痰湿质', '湿热质', '血瘀质', '气郁质', '特禀质']
+ELEMENT_NAMES = ['木', '火', '土', '金', '水']
+
+
+def _readonly(rows):
+    arr = np.array(rows, dtype=np.float64)
+    arr.setflags(write=False)
+    return arr
+
+
+# 权重矩阵 W (5x9)，行：木, 火, 土, 金, 水；列：ELEMENT_SCORE_ORDER
+# -----------------------------------------------------------------------------------
+# 权重设定依据：
+# 平和质：对五行都有均衡的加持 (0.2)
+# 气郁 -> 木 (0.9)
+# 湿热 -> 火 (0.7), 土 (0.3)
+# 阴虚 -> 火 (0.6), 水 (0.4), 木 (0.3)
+# 痰湿 -> 土 (0.8), 水 (0.2)
+# 气虚 -> 土 (0.6), 金 (0.5)
+# 阳虚 -> 水 (0.8), 土 (0.2)
+# 血瘀 -> 木 (0.4), 火 (0.4)
+# 特禀 -> 金 (0.8)
+# -----------------------------------------------------------------------------------
+LINEAR_WEIGHTS = _readonly([
+    # 平   气虚  阳虚  阴虚  痰湿  湿热  血瘀  气郁  特禀
+    [0.2, 0.1, 0.1, 0.3, 0.1, 0.2, 0.5, 0.9, 0.1],  # 木 (Wood) - 肝
+    [0.2, 0.2, 0.1, 0.7, 0.1, 0.8, 0.5, 0.3, 0.1],  # 火 (Fire) - 心
+    [0.2, 0.8, 0.4, 0.1, 0.9, 0.5, 0.1, 0.2, 0.1],  # 土 (Earth) - 脾
+    [0.2, 0.7, 0.2, 0.2, 0.4, 0.1, 0.1, 0.1, 0.9],  # 金 (Metal) - 肺
+    [0.2, 0.1, 0.9, 0.6, 0.4, 0.2, 0.2, 0.1, 0.2]  # 水 (Water) - 肾
+])
+
+ENHANCED_WEIGHTS = _readonly([
+    # 平   气虚  阳虚  阴虚  痰湿  湿热  血瘀  气郁  特禀
+    [0.1, 0.1, 0.1, 0.3, 0.1, 0.2, 0.6, 0.9, 0.1],  # 木 (降低了平和质权重 0.2->0.1)
+    [0.1, 0.2, 0.1, 0.7, 0.1, 0.8, 0.5, 0.3, 0.1],  # 火
+    [0.1, 0.8, 0.4, 0.1, 0.9, 0.5, 0.1, 0.2, 0.1],  # 土
+    [0.1, 0.7, 0.2, 0.2, 0.4, 0.1, 0.1, 0.1, 0.9],  # 金
+    [0.1, 0.1, 0.9, 0.6, 0.4, 0.2, 0.2, 0.1, 0.2]  # 水
+])
+
+# enhanced 方案中低于该分数的体质 (平和质除外) 视为“静默”，不计入贡献
+ENHANCED_THRESHOLD = 50
+
+
+def _project(weights, score_vectors):
+    """
+    (N, 9) -> (N, 5) 加权求和
+    按列顺序逐项累加 (逐元素运算，不走 BLAS)：求和顺序与 N 无关，
+    单条与批量的结果逐位一致，int 截断不会因调用方式不同而相差 1
+    """
+    raw = score_vectors[:, :1] * weights[:, 0]
+    for j in range(1, weights.shape[1]):
+        raw += score_vectors[:, j:j + 1] * weights[:, j]
+    return raw
+
+
+def _linear(score_matrix):
+    elements_raw = _project(LINEAR_WEIGHTS, score_matrix / 100.0)
+    # 线性变换保底 20 分，并限制在 10-95 之间 (避免 0 或 100 这种极端值)
+    return np.clip(elements_raw * 60 + 20, 10, 95)
+
+
+def _enhanced(score_matrix):
+    # 抑制底噪：只有超过阈值的体质计入贡献，平和质保留原始值作为基底
+    thresholded = np.where(score_matrix > ENHANCED_THRESHOLD, score_matrix, 0)
+    thresholded[:, 0] = score_matrix[:, 0]
+    elements_raw = _project(ENHANCED_WEIGHTS, thresholded / 100.0)
+
+    # 非线性放大：x^1.5 让大的数值更大，小的数值更小
+    enhanced = np.power(elements_raw, 1.5)
+
+    # 按行动态缩放：最大值接近 95，最小值保留在 20 左右；全 0 行直接 +20
+    norm = enhanced - enhanced.min(axis=1, keepdims=True)
+    span = norm.max(axis=1, keepdims=True)
+    ratio = np.divide(75, span, out=np.ones_like(span), where=span != 0)
+    all_zero = enhanced.max(axis=1, keepdims=True) == 0
+    return np.where(all_zero, enhanced + 20, norm * ratio + 20)
+
+
+_VARIANTS = {"linear": _linear, "enhanced": _enhanced}
+
+
+def five_elements_batch(score_matrix, variant=ELEMENTS_VARIANT):
+    """
+    批量计算五行得分
+    输入: (N, 9) 体质得分，列顺序为 ELEMENT_SCORE_ORDER
+    输出: (N, 5) int 五行得分，列顺序为 ELEMENT_NAMES
+    """
+    if variant not in _VARIANTS:
+        raise ValueError(f"未知的五行计分方案: {variant}")
+    score_matrix = np.atleast_2d(np.asarray(score_matrix, dtype=np.float64))
+    return _VARIANTS[variant](score_matrix).astype(int)
+
+
+@lru_cache(maxsize=4096)
+def _five_elements_cached(variant, score_key):
+    return tuple(five_elements_batch([score_key], variant)[0].tolist())
+
+
+def calculate_five_elements(tcm_scores, variant=ELEMENTS_VARIANT):
+    """
+    单条计算：{体质: 得分} -> {'木', '火', '土', '金', '水'}
+    以保留两位小数的得分元组为键做进程内记忆化 (量表得分本身就是两位小数)
+    """
+    score_key = tuple(round(float(tcm_scores.get(k, 0)), 2) for k in ELEMENT_SCORE_ORDER)
+    return dict(zip(ELEMENT_NAMES, _five_elements_cached(variant, score_key)))
\ No newline at end of file
@@ -1,45 +1,102 @@
-import torch
-import torch.nn as nn
 import numpy as np
 import os
 import random
+import threading
+import time
 
+from utils_metrics import timed
+from logic_elements import calculate_five_elements
+
+# 推理后端：
+#   torch (默认) - 加载 best_mbti_model.pth，用 PyTorch 前向
+#   numpy        - 加载导出的 best_mbti_model.npz，纯 NumPy 前向，不 import torch
+MODEL_BACKEND = os.environ.get("CYBERNJ_MODEL_BACKEND", "torch").strip().lower()
+
+# torch 后端的模型变体 (由 logic_model_optimize.py 导出并做精度 / 延迟对比)：
+#   fp32        - 原始 best_mbti_model.pth (默认)
+#   torchscript - 冻结的 TorchScript 图
+#   int8        - int8 动态量化 + TorchScript
+MODEL_VARIANT = os.environ.get("CYBERNJ_MODEL_VARIANT", "fp32").strip().lower()
 
 # ==============================================================================
-# 1. 模型定义 (保持不变)
+# 1. 模型定义 (见 logic_model_net；numpy 后端不 import torch)
 # ==============================================================================
-class MBTIPredictor(nn.Module):
-    def __init__(self):
-        super(MBTIPredictor, self).__init__()
-        self.fc1 = nn.Linear(76, 32)
-        self.fc2 = nn.Linear(32, 8)
-        self.fc4 = nn.Linear(8, 16)
-        self.relu = nn.ReLU()
-
-    def forward(self, x):
-        x = self.relu(self.fc1(x))
-        x = self.relu(self.fc2(x))
-        x = self.fc4(x)
-        return x
+if MODEL_BACKEND != "numpy":
+    import torch
+    from logic_model_net import MBTIPredictor
 
 
 # ==============================================================================
-# 2. 资源加载 (保持不变)
+# 2. 资源加载 (按 MODEL_BACKEND 选择)
 # ==============================================================================
 MODEL_PATH = 'best_mbti_model.pth'
 _model_instance = None
 _num_to_mbti_map = None
+# 加载锁：并发的首批请求只会加载一次权重
+_model_lock = threading.Lock()
+_model_load_seconds = None
+# 实际加载的变体 (请求的变体未知或加载失败时退回 fp32，以此为准)
+_loaded_variant = None
 
 
 def load_model_resources():
-    global _model_instance, _num_to_mbti_map
     if _model_instance is not None:
         return _model_instance, _num_to_mbti_map
 
+    global _model_load_seconds
+    with _model_lock:
+        if _model_instance is not None:
+            return _model_instance, _num_to_mbti_map
+
+        # 只统计真正加载的耗时，命中缓存的调用不计入
+        start = time.perf_counter()
+        with timed("load_model_resources"):
+            result = _load_model_resources()
+        _model_load_seconds = time.perf_counter() - start
+        return result
+
+
+def warm_up_model():
+    """
+    启动时预热：加载权重并用全 0 输入跑一次前向，触发各后端的惰性分配
+    返回 {"backend", "variant", "loaded", "load_seconds", "warmup_seconds"}，供启动日志和管理员面板展示
+    variant 为实际在用的变体 (而非 CYBERNJ_MODEL_VARIANT 的请求值)
+    """
+    model, _ = load_model_resources()
+    info = {
+        "backend": MODEL_BACKEND,
+        "variant": _loaded_variant,
+        "loaded": model is not None,
+        "load_seconds": _model_load_seconds,
+        "warmup_seconds": None,
+    }
+    if model is None:
+        return info
+
+    start = time.perf_counter()
+    _predict_indices(model, np.zeros((1, 76), dtype=np.float32))
+    info["warmup_seconds"] = time.perf_counter() - start
+    print(f"[Info] 模型预热完成 ({MODEL_BACKEND})：加载 {info['load_seconds'] or 0:.3f}s，"
+          f"首次前向 {info['warmup_seconds']:.3f}s")
+    return info
+
+
+def _load_model_resources():
+    global _model_instance, _num_to_mbti_map, _loaded_variant
+    if MODEL_BACKEND == "numpy":
+        return _load_numpy_resources()
+
     if not os.path.exists(MODEL_PATH):
         print(f"[Warning] 模型文件 {MODEL_PATH} 未找到。")
         return None, None
 
+    if MODEL_VARIANT != "fp32":
+        model, mapper = _load_optimized_variant()
+        if model is not None:
+            _model_instance, _num_to_mbti_map = model, mapper
+            _loaded_variant = MODEL_VARIANT
+            return _model_instance, _num_to_mbti_map
+
     try:
         checkpoint = torch.load(MODEL_PATH, map_location=torch.device('cpu'), weights_only=False)
         model = MBTIPredictor()
@@ -47,89 +104,115 @@ def load_model_resources():
         model.eval()
         _model_instance = model
         _num_to_mbti_map = checkpoint['num_to_mbti']
+        _loaded_variant = "fp32"
+        return _model_instance, _num_to_mbti_map
+    except Exception as e:
+        print(f"[Error] 模型加载失败: {e}")
+        return None, None
+
+
+def _load_optimized_variant():
+    """加载 MODEL_VARIANT 指定的优化产物；缺失或过期时先导出一次，失败则返回 (None, None) 退回 fp32"""
+    from logic_model_optimize import VARIANT_PATHS, export_variants, is_variant_stale, load_variant
+
+    if MODEL_VARIANT not in VARIANT_PATHS:
+        print(f"[Warning] 未知的模型变体 {MODEL_VARIANT}，使用 fp32。")
+        return None, None
+
+    try:
+        if is_variant_stale(MODEL_VARIANT, MODEL_PATH):
+            export_variants(MODEL_PATH, [MODEL_VARIANT])
+            print(f"[Info] 已从 {MODEL_PATH} 导出 {VARIANT_PATHS[MODEL_VARIANT]}")
+        return load_variant(MODEL_VARIANT)
+    except Exception as e:
+        print(f"[Error] 模型变体 {MODEL_VARIANT} 加载失败，使用 fp32: {e}")
+        return None, None
+
+
+def _load_numpy_resources():
+    """numpy 后端：读取 .npz；若 .npz 缺失或过期且环境里有 torch，则先导出一次"""
+    global _model_instance, _num_to_mbti_map
+    from logic_model_numpy import NPZ_PATH, NumpyMBTIPredictor, export_npz, is_npz_stale
+
+    if is_npz_stale(MODEL_PATH, NPZ_PATH) and os.path.exists(MODEL_PATH):
+        try:
+            export_npz(MODEL_PATH, NPZ_PATH)
+            print(f"[Info] 已从 {MODEL_PATH} 导出 {NPZ_PATH}")
+        except ImportError:
+            print(f"[Warning] 未安装 torch，无法重新导出 {NPZ_PATH}，沿用现有权重。")
+        except Exception as e:
+            print(f"[Error] 导出 {NPZ_PATH} 失败: {e}")
+
+    if not os.path.exists(NPZ_PATH):
+        print(f"[Warning] 权重文件 {NPZ_PATH} 未找到。")
+        return None, None
+
+    try:
+        _model_instance, _num_to_mbti_map = NumpyMBTIPredictor.from_npz(NPZ_PATH)
         return _model_instance, _num_to_mbti_map
     except Exception as e:
         print(f"[Error] 模型加载失败: {e}")
         return None, None
 
 
+def _predict_indices(model, features):
+    """features: (N, 76) float32 ndarray -> 每行预测的类别编号列表"""
+    if MODEL_BACKEND == "numpy":
+        return np.argmax(model(features), axis=1).tolist()
+    with torch.inference_mode():
+        output = model(torch.from_numpy(features))
+        return torch.argmax(output, dim=1).tolist()
+
+
 # ==============================================================================
-# 3. 五行计算逻辑 (新增: 矩阵权重法)
+# 3. 五行计算逻辑 (矩阵权重法，实现见 logic_elements)
 # ==============================================================================
 def calculate_five_elements_matrix(tcm_scores):
     """
     基于中医脏腑理论的线性映射：9种体质 -> 5行能量
-    【优化版】增强差异性，使雷达图更具特征
+    【优化版】增强差异性，使雷达图更具特征 (logic_elements 的 enhanced 方案)
     """
-    # 1. 定义体质顺序
-    labels = ['平和质', '气虚质', '阳虚质', '阴虚质', '痰湿质', '湿热质', '血瘀质', '气郁质', '特禀质']
-
-    # -------------------------------------------------------------
-    # 🔧 优化点 1: 预处理输入分数，抑制底噪
-    # -------------------------------------------------------------
-    # 原始分数
-    raw_scores = np.array([tcm_scores.get(k, 0) for k in labels])
-
-    # 只有当分数大于 30 (阈值) 时才计入有效贡献，
-    # 否则视为“静默”状态，减少不相关的干扰
-    # 但保留 "平和质" (索引0) 的原始值作为基底
-    threshold_scores = np.where(raw_scores > 50, raw_scores, 0)
-    threshold_scores[0] = raw_scores[0]  # 平和质不设阈值
-
-    # 归一化输入 (0-1)
-    score_vector = threshold_scores / 100.0
-
-    # 2. 定义权重矩阵 W (5x9) - 保持不变
-    # 行：木, 火, 土, 金, 水
-    weights = np.array([
-        # 平   气虚  阳虚  阴虚  痰湿  湿热  血瘀  气郁  特禀
-        [0.1, 0.1, 0.1, 0.3, 0.1, 0.2, 0.6, 0.9, 0.1],  # 木 (降低了平和质权重 0.2->0.1)
-        [0.1, 0.2, 0.1, 0.7, 0.1, 0.8, 0.5, 0.3, 0.1],  # 火
-        [0.1, 0.8, 0.4, 0.1, 0.9, 0.5, 0.1, 0.2, 0.1],  # 土
-        [0.1, 0.7, 0.2, 0.2, 0.4, 0.1, 0.1, 0.1, 0.9],  # 金
-        [0.1, 0.1, 0.9, 0.6, 0.4, 0.2, 0.2, 0.1, 0.2]  # 水
-    ])
-
-    # 3. 矩阵乘法
-    elements_raw = np.dot(weights, score_vector)
-
-    # -------------------------------------------------------------
-    # 🔧 优化点 2: 非线性放大 (重点！)
-    # -------------------------------------------------------------
-    # 使用指数函数 (Power Function) 拉伸差异
-    # x^1.5 会让大的数值更大，小的数值更小
-    elements_enhanced = np.power(elements_raw, 1.5)
-
-    # 4. 重新缩放回 10-95
-    # 先找到当前的最大值，以最大值为基准进行归一化
-    if np.max(elements_enhanced) == 0:
-        final_scores = elements_enhanced + 20  # 防止全0
-    else:
-        # 动态缩放：让最大值接近 95，最小值保留在 20 左右
-        # 这样无论原始分多低，雷达图都会撑满，差异一眼可见
-        norm = (elements_enhanced - np.min(elements_enhanced))
-        if np.max(norm) == 0:
-            ratio = 1
-        else:
-            ratio = 75 / np.max(norm)  # 95-20=75 的跨度
-
-        final_scores = norm * ratio + 20
-
-    # 5. 格式化输出
-    element_names = ['木', '火', '土', '金', '水']
-    result = {name: int(score) for name, score in zip(element_names, final_scores)}
-
-    return result
+    return calculate_five_elements(tcm_scores, "enhanced")
+
+
+# ==============================================================================
+# 3.1 特征构造 (单条 / 批量共用)
+# ==============================================================================
+SCORE_ORDER = ['平和质', '气虚质', '阳虚质', '阴虚质', '痰湿质', '湿热质', '血瘀质', '气郁质', '特禀质']
+
+# Excel 题序 -> 训练时的特征顺序 (平和, 气虚, 阳虚, 阴虚, 痰湿, 湿热, 血瘀, 气郁, 特禀)
+_ALIGNED_SLICES = [(59, 67), (15, 23), (0, 7), (7, 15), (23, 31), (31, 38), (38, 45), (45, 52), (52, 59)]
+ALIGNED_INDEX = [i for start, end in _ALIGNED_SLICES for i in range(start, end)]
+
+
+def _build_feature_vector(tcm_scores, answers):
+    """把 67 题答案按训练顺序重排，并拼接 9 个体质分，得到 76 维特征"""
+    aligned_answers = [answers[i] for i in ALIGNED_INDEX]
+    input_scores = [tcm_scores.get(k, 0) for k in SCORE_ORDER]
+    return aligned_answers + input_scores
+
+
+def build_feature_matrix(score_matrix, answer_matrix):
+    """
+    批量版 _build_feature_vector
+    score_matrix: (N, 9) 列顺序为 SCORE_ORDER；answer_matrix: (N, 67) Excel 题序
+    返回 (N, 76) float32 连续数组
+    """
+    score_matrix = np.asarray(score_matrix, dtype=np.float32)
+    answer_matrix = np.asarray(answer_matrix, dtype=np.float32)
+    return np.ascontiguousarray(np.concatenate([answer_matrix[:, ALIGNED_INDEX], score_matrix], axis=1))
 
 
 # ==============================================================================
 # 4. 核心预测接口 (整合了 MBTI模型预测 + 五行矩阵计算)
 # ==============================================================================
-def predict_mapping(tcm_scores, answers=None):
+@timed("predict_mapping")
+def predict_mapping(tcm_scores, answers=None, elements_variant="enhanced"):
     """
     输入:
       tcm_scores: 9种体质得分字典
       answers: Excel顺序的原始问卷列表
+      elements_variant: 五行计分方案 (见 logic_elements)
     输出:
       mbti_result (str)
       five_elements_result (dict) - 真实计算值
@@ -140,9 +223,9 @@ def predict_mapping(tcm_scores, answers=None):
         print("[Warning] predict_mapping 未接收到 answers，将使用全0补全。")
         answers = [0] * 67
 
-    # 先计算五行得分 (因为这部分不需要 PyTorch 模型，只需要分数)
+    # 先计算五行得分 (因为这部分不需要神经网络模型，只需要分数)
     # ✅ 这里改用了真实的矩阵计算，不再是随机数
-    real_five_elements = calculate_five_elements_matrix(tcm_scores)
+    real_five_elements = calculate_five_elements(tcm_scores, elements_variant)
 
     model, mapper = load_model_resources()
 
@@ -156,34 +239,14 @@ def predict_mapping(tcm_scores, answers=None):
         answers = (answers + [0] * 67)[:67]
 
     # --- PART C: 数据预处理 (特征重排) ---
-    q_yang = answers[0:7]
-    q_yin = answers[7:15]
-    q_qi = answers[15:23]
-    q_phlegm = answers[23:31]
-    q_damp = answers[31:38]
-    q_blood = answers[38:45]
-    q_qistagn = answers[45:52]
-    q_special = answers[52:59]
-    q_peace = answers[59:67]
-
-    aligned_answers = (
-            q_peace + q_qi + q_yang + q_yin + q_phlegm +
-            q_damp + q_blood + q_qistagn + q_special
-    )
-
-    score_order = ['平和质', '气虚质', '阳虚质', '阴虚质', '痰湿质', '湿热质', '血瘀质', '气郁质', '特禀质']
-    input_scores = [tcm_scores.get(k, 0) for k in score_order]
-    input_76_features = aligned_answers + input_scores
+    input_76_features = _build_feature_vector(tcm_scores, answers)
 
     # --- PART D: 神经网络预测 MBTI ---
-    input_tensor = torch.tensor(input_76_features, dtype=torch.float32).unsqueeze(0)
-    input_tensor = (input_tensor - 0.0) / 1.0  # 标准化
+    input_matrix = np.array([input_76_features], dtype=np.float32)
 
     try:
-        with torch.no_grad():
-            output = model(input_tensor)
-            _, pred_num = torch.max(output, 1)
-            mbti_result = mapper[pred_num.item()]
+        pred_num = _predict_indices(model, input_matrix)[0]
+        mbti_result = mapper[pred_num]
     except Exception as e:
         print(f"[Error] 预测出错: {e}")
         return _simulate_mbti_fallback(tcm_scores), real_five_elements
@@ -192,6 +255,76 @@ def predict_mapping(tcm_scores, answers=None):
     return mbti_result, real_five_elements
 
 
+# ==============================================================================
+# 4.1 批量预测接口 (离线重算 research_data.csv 用)
+# ==============================================================================
+def predict_mapping_batch(list_of_scores, list_of_answers, elements_variant="enhanced"):
+    """
+    批量版 predict_mapping：一次构造 (N, 76) 特征矩阵，只做一次前向传播 (torch / numpy 后端均可)
+    输入:
+      list_of_scores: 每行一个 9 种体质得分字典
+      list_of_answers: 每行一个 Excel 顺序的 67 题答案列表
+    输出:
+      mbti_results (list[str]), five_elements_results (list[dict])
+      与逐行调用 predict_mapping 的结果一一对应
+    """
+    if len(list_of_scores) != len(list_of_answers):
+        raise ValueError(f"scores 与 answers 行数不一致: {len(list_of_scores)} != {len(list_of_answers)}")
+
+    five_elements_results = [calculate_five_elements(s, elements_variant) for s in list_of_scores]
+    if not list_of_scores:
+        return [], five_elements_results
+
+    model, mapper = load_model_resources()
+    if model is None:
+        return [_simulate_mbti_fallback(s) for s in list_of_scores], five_elements_results
+
+    # 补全规则与 predict_mapping 一致：None 视为全 0，长度不足补 0，超长截断
+    features = np.array(
+        [_build_feature_vector(s, (([] if a is None else list(a)) + [0] * 67)[:67])
+         for s, a in zip(list_of_scores, list_of_answers)],
+        dtype=np.float32
+    )
+
+    try:
+        pred_nums = _predict_indices(model, features)
+        mbti_results = [mapper[n] for n in pred_nums]
+    except Exception as e:
+        print(f"[Error] 批量预测出错: {e}")
+        mbti_results = [_simulate_mbti_fallback(s) for s in list_of_scores]
+
+    return mbti_results, five_elements_results
+
+
+def predict_mbti_matrix(score_matrix, answer_matrix):
+    """
+    纯数组版批量预测 (离线重算用，省去逐行构造字典)
+    输入:
+      score_matrix: (N, 9) 体质得分，列顺序为 SCORE_ORDER
+      answer_matrix: (N, 67) Excel 顺序的原始答案
+    输出:
+      list[str] 每行的 MBTI
+    """
+    score_matrix = np.asarray(score_matrix, dtype=np.float32)
+    answer_matrix = np.asarray(answer_matrix, dtype=np.float32)
+    if len(score_matrix) == 0:
+        return []
+
+    def _fallback():
+        return [_simulate_mbti_fallback(dict(zip(SCORE_ORDER, row))) for row in score_matrix.tolist()]
+
+    model, mapper = load_model_resources()
+    if model is None:
+        return _fallback()
+
+    features = build_feature_matrix(score_matrix, answer_matrix)
+    try:
+        return [mapper[n] for n in _predict_indices(model, features)]
+    except Exception as e:
+        print(f"[Error] 批量预测出错: {e}")
+        return _fallback()
+
+
 # ==============================================================================
 # 5. 备用模拟函数 (仅用于MBTI失败时)
 # ==============================================================================
@@ -0,0 +1,21 @@
+import torch.nn as nn
+
+
+# ==============================================================================
+# MBTIPredictor 网络结构 (单独成模块，numpy 后端下也能按需导入)
+# ==============================================================================
+# logic_model 只在 torch 后端时导入本模块；logic_model_optimize / logic_model_numpy
+# 等离线工具需要 torch 时直接从这里导入，与 CYBERNJ_MODEL_BACKEND 无关。
+class MBTIPredictor(nn.Module):
+    def __init__(self):
+        super(MBTIPredictor, self).__init__()
+        self.fc1 = nn.Linear(76, 32)
+        self.fc2 = nn.Linear(32, 8)
+        self.fc4 = nn.Linear(8, 16)
+        self.relu = nn.ReLU()
+
+    def forward(self, x):
+        x = self.relu(self.fc1(x))
+        x = self.relu(self.fc2(x))
+        x = self.fc4(x)
+        return x
\ No newline at end of file
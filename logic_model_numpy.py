@@ -0,0 +1,90 @@
+import os
+import argparse
+import numpy as np
+
+
+# ==============================================================================
+# 纯 NumPy 推理引擎 (无需 import torch)
+# ==============================================================================
+# MBTIPredictor 只是一个 76 -> 32 -> 8 -> 16 的小 MLP，
+# 推理时用 NumPy 矩阵乘法即可，torch 只在导出权重这一步需要。
+NPZ_PATH = 'best_mbti_model.npz'
+
+
+class NumpyMBTIPredictor:
+    """与 logic_model_net.MBTIPredictor 前向传播等价的 NumPy 实现"""
+
+    def __init__(self, w1, b1, w2, b2, w4, b4):
+        # 权重以 (in, out) 形式保存，前向时直接 x @ W
+        self.w1, self.b1 = w1, b1
+        self.w2, self.b2 = w2, b2
+        self.w4, self.b4 = w4, b4
+
+    def __call__(self, x):
+        """x: (N, 76) float32 -> logits: (N, 16)"""
+        x = np.maximum(x @ self.w1 + self.b1, 0)
+        x = np.maximum(x @ self.w2 + self.b2, 0)
+        return x @ self.w4 + self.b4
+
+    @classmethod
+    def from_npz(cls, npz_path=NPZ_PATH):
+        """读取导出的 .npz，返回 (model, num_to_mbti)"""
+        with np.load(npz_path, allow_pickle=False) as data:
+            model = cls(
+                data['fc1_w'], data['fc1_b'],
+                data['fc2_w'], data['fc2_b'],
+                data['fc4_w'], data['fc4_b'],
+            )
+            mapper = {i: str(label) for i, label in enumerate(data['labels'])}
+        return model, mapper
+
+
+def export_npz(pth_path='best_mbti_model.pth', npz_path=NPZ_PATH):
+    """
+    把 .pth 检查点一次性导出为 .npz (仅此步骤需要 torch)
+    先写临时文件再原子替换：服务进程启动时可能并发导出，其他 worker 不会读到写了一半的文件
+    """
+    import torch
+
+    checkpoint = torch.load(pth_path, map_location=torch.device('cpu'), weights_only=False)
+    state = checkpoint['model_state_dict']
+    num_to_mbti = checkpoint['num_to_mbti']
+
+    def _w(name):
+        return state[f'{name}.weight'].detach().numpy().T.astype(np.float32)
+
+    def _b(name):
+        return state[f'{name}.bias'].detach().numpy().astype(np.float32)
+
+    labels = np.array([num_to_mbti[i] for i in range(len(num_to_mbti))])
+    # 传文件对象而不是路径，np.savez 不会给临时文件名追加 .npz
+    tmp_path = f"{npz_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                fc1_w=_w('fc1'), fc1_b=_b('fc1'),
+                fc2_w=_w('fc2'), fc2_b=_b('fc2'),
+                fc4_w=_w('fc4'), fc4_b=_b('fc4'),
+                labels=labels,
+            )
+        os.replace(tmp_path, npz_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return npz_path
+
+
+def is_npz_stale(pth_path='best_mbti_model.pth', npz_path=NPZ_PATH):
+    """.npz 不存在或比 .pth 旧时需要重新导出"""
+    if not os.path.exists(npz_path):
+        return True
+    return os.path.exists(pth_path) and os.path.getmtime(pth_path) > os.path.getmtime(npz_path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="导出 MBTIPredictor 权重为 NumPy .npz")
+    parser.add_argument('--pth', default='best_mbti_model.pth')
+    parser.add_argument('--out', default=NPZ_PATH)
+    args = parser.parse_args()
+    print(f"✅ 已导出: {export_npz(args.pth, args.out)}")
\ No newline at end of file
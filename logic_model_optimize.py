@@ -0,0 +1,202 @@
+import os
+import json
+import time
+import random
+import argparse
+import warnings
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+# ==============================================================================
+# CPU 部署用的优化模型产物 (TorchScript 冻结图 / int8 动态量化)
+# ==============================================================================
+# 用法：python logic_model_optimize.py --output model_variants.json
+#   1. 从 best_mbti_model.pth 导出全部变体
+#   2. 在留出答案集上与 fp32 模型比较 top-1 一致率，并测量单条 / 批量延迟
+#   3. 推荐一致率达标且最快的变体，部署时设置 CYBERNJ_MODEL_VARIANT=<变体名>
+MODEL_PATH = 'best_mbti_model.pth'
+
+# 变体名 -> 产物路径 (fp32 即原始 .pth，无需导出)
+VARIANT_PATHS = {
+    "torchscript": 'best_mbti_model.ts.pt',
+    "int8": 'best_mbti_model.int8.pt',
+}
+MODEL_VARIANTS = ["fp32"] + list(VARIANT_PATHS)
+
+# num_to_mbti 随 TorchScript 产物一起保存在 extra files 里
+_MAPPER_FILE = "num_to_mbti.json"
+
+
+def load_fp32_model(pth_path=MODEL_PATH):
+    """读取原始检查点，返回 (eval 模式的 MBTIPredictor, num_to_mbti)"""
+    from logic_model_net import MBTIPredictor
+
+    checkpoint = torch.load(pth_path, map_location=torch.device('cpu'), weights_only=False)
+    model = MBTIPredictor()
+    model.load_state_dict(checkpoint['model_state_dict'])
+    model.eval()
+    return model, checkpoint['num_to_mbti']
+
+
+def build_variant(model, variant):
+    """由 fp32 模型构造优化后的 TorchScript 模块"""
+    example = torch.zeros(1, 76)
+    # torch.jit / torch.ao.quantization 在新版本里会发出弃用警告，这里统一屏蔽
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        if variant == "torchscript":
+            return torch.jit.freeze(torch.jit.script(model))
+        if variant == "int8":
+            quantized = torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+            return torch.jit.freeze(torch.jit.trace(quantized, example).eval())
+    raise ValueError(f"未知的模型变体: {variant}")
+
+
+def export_variants(pth_path=MODEL_PATH, variants=tuple(VARIANT_PATHS)):
+    """
+    导出指定变体，返回 {变体名: 产物路径}
+    先写临时文件再原子替换：服务进程可能在启动时并发导出，其他 worker 不会读到写了一半的文件
+    """
+    model, num_to_mbti = load_fp32_model(pth_path)
+    mapper_json = json.dumps({str(k): v for k, v in num_to_mbti.items()})
+
+    exported = {}
+    for variant in variants:
+        path = VARIANT_PATHS[variant]
+        module = build_variant(model, variant)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                torch.jit.save(module, tmp_path, _extra_files={_MAPPER_FILE: mapper_json})
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        exported[variant] = path
+    return exported
+
+
+def is_variant_stale(variant, pth_path=MODEL_PATH):
+    """产物不存在或比 .pth 旧时需要重新导出"""
+    path = VARIANT_PATHS[variant]
+    if not os.path.exists(path):
+        return True
+    return os.path.exists(pth_path) and os.path.getmtime(pth_path) > os.path.getmtime(path)
+
+
+def load_variant(variant):
+    """读取导出的 TorchScript 产物，返回 (model, num_to_mbti)"""
+    extra_files = {_MAPPER_FILE: ""}
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        model = torch.jit.load(VARIANT_PATHS[variant], map_location="cpu", _extra_files=extra_files)
+    model.eval()
+    mapper = {int(k): v for k, v in json.loads(extra_files[_MAPPER_FILE]).items()}
+    return model, mapper
+
+
+# ==============================================================================
+# 精度一致性与延迟对比
+# ==============================================================================
+def heldout_features(n=5000, seed=2027, csv_path=None):
+    """
+    留出答案集的 (N, 76) 特征矩阵
+    csv_path 指定时使用 research_data.csv 中的真实答案，否则用“随机一键填表”生成器合成
+    """
+    from logic_tcm import load_question_bank, calculate_scores_matrix, generate_random_answers
+    from logic_model import SCORE_ORDER, build_feature_matrix
+
+    if csv_path:
+        import pandas as pd
+        from utils_analytics import parse_answer_strings
+        df = pd.read_csv(csv_path, dtype={"raw_answers_str": str}, encoding="utf-8-sig")
+        answers, valid = parse_answer_strings(df["raw_answers_str"])
+        answers = answers[valid][:n]
+    else:
+        rng = random.Random(seed)
+        answers = np.array([generate_random_answers(rng) for _ in range(n)], dtype=np.uint8)
+
+    spec = load_question_bank().spec
+    scores = calculate_scores_matrix(answers, spec)
+    order = [spec.type_names.index(t) for t in SCORE_ORDER]
+    return build_feature_matrix(scores[:, order], answers)
+
+
+def _predict(model, features):
+    with torch.inference_mode():
+        return torch.argmax(model(torch.from_numpy(features)), dim=1).numpy()
+
+
+def _latency(model, features, repeats):
+    """单条请求延迟中位数 (ms) 与整批吞吐 (行/秒)"""
+    single = features[:1]
+    for _ in range(10):
+        _predict(model, single)
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        _predict(model, single)
+        samples.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    _predict(model, features)
+    batch_seconds = time.perf_counter() - start
+    return float(np.median(samples)) * 1000, len(features) / batch_seconds
+
+
+def compare_variants(features, pth_path=MODEL_PATH, repeats=500):
+    """
+    对每个变体计算与 fp32 的 top-1 一致率及延迟
+    返回 {变体名: {"agreement", "single_ms", "batch_rows_per_s"}}
+    """
+    fp32_model, _ = load_fp32_model(pth_path)
+    models = {"fp32": fp32_model}
+    for variant in VARIANT_PATHS:
+        models[variant] = load_variant(variant)[0]
+
+    reference = _predict(fp32_model, features)
+    report = {}
+    for name, model in models.items():
+        single_ms, rows_per_s = _latency(model, features, repeats)
+        report[name] = {
+            "agreement": float(np.mean(_predict(model, features) == reference)),
+            "single_ms": round(single_ms, 4),
+            "batch_rows_per_s": round(rows_per_s, 1),
+        }
+    return report
+
+
+def recommend_variant(report, min_agreement=1.0):
+    """一致率不低于 min_agreement 的变体中单条延迟最低者"""
+    candidates = [name for name, r in report.items() if r["agreement"] >= min_agreement]
+    return min(candidates, key=lambda name: report[name]["single_ms"]) if candidates else "fp32"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="导出 MBTIPredictor 的 CPU 优化变体并做精度 / 延迟对比")
+    parser.add_argument('--pth', default=MODEL_PATH)
+    parser.add_argument('--eval-csv', default=None, help="留出集 CSV (默认用随机填表生成器合成)")
+    parser.add_argument('--n', type=int, default=5000, help="留出集行数")
+    parser.add_argument('--seed', type=int, default=2027)
+    parser.add_argument('--min-agreement', type=float, default=1.0, help="可接受的最低 top-1 一致率")
+    parser.add_argument('--output', default=None, help="JSON 报告输出文件")
+    args = parser.parse_args()
+
+    torch.set_num_threads(1)
+    for variant, path in export_variants(args.pth).items():
+        print(f"✅ 已导出 {variant}: {path}")
+
+    features = heldout_features(args.n, args.seed, args.eval_csv)
+    report = compare_variants(features, args.pth)
+    print(f"{'variant':<12}{'agreement':>10}{'single_ms':>12}{'rows/s':>12}")
+    for name, r in report.items():
+        print(f"{name:<12}{r['agreement']:>10.4f}{r['single_ms']:>12.4f}{r['batch_rows_per_s']:>12.1f}")
+
+    best = recommend_variant(report, args.min_agreement)
+    print(f"👉 推荐：CYBERNJ_MODEL_VARIANT={best}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"n": len(features), "report": report, "recommended": best}, f, ensure_ascii=False, indent=2)
\ No newline at end of file
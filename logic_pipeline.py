@@ -0,0 +1,108 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from logic_tcm import load_question_bank, calculate_scores_vectorized, get_diagnosis_result
+from logic_mapping import predict_mbti
+from utils_viz import render_share_png
+from utils_metrics import timed
+
+# ==========================================
+# 量表提交后的完整计算流水线 (不含任何 st.* 调用，可在后台线程运行)
+# ==========================================
+PIPELINE_STAGES = ["scores", "diagnosis", "mbti", "poster"]
+
+# 进程级线程池：app.py 每次 rerun 都会重新执行，线程池必须放在模块里复用
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="scale-pipeline")
+
+# ==========================================
+# 结果缓存：答案元组 -> {"scores", "main_diagnosis", "mbti", "elements"}
+# ==========================================
+# 随机填表测试、重测和分享链接里的相同答案会反复出现，命中时跳过计分、MBTI 推理和五行计算；
+# 海报由 render_share_png 自己的缓存负责。LRU 淘汰，条目数由 CYBERNJ_RESULT_CACHE_SIZE 配置 (0 为关闭)
+RESULT_CACHE_SIZE = int(os.environ.get("CYBERNJ_RESULT_CACHE_SIZE", "4096"))
+
+_result_cache = OrderedDict()
+_result_cache_lock = threading.Lock()
+_result_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def _copy_result(result):
+    # 调用方会把结果存进 session_state，返回副本，避免改动缓存里的字典
+    return {
+        "scores": dict(result["scores"]),
+        "main_diagnosis": result["main_diagnosis"],
+        "mbti": result["mbti"],
+        "elements": dict(result["elements"]),
+    }
+
+
+def _cache_get(key):
+    with _result_cache_lock:
+        result = _result_cache.get(key)
+        if result is None:
+            _result_cache_stats["misses"] += 1
+            return None
+        _result_cache.move_to_end(key)
+        _result_cache_stats["hits"] += 1
+    return _copy_result(result)
+
+
+def _cache_put(key, result):
+    if RESULT_CACHE_SIZE <= 0:
+        return
+    with _result_cache_lock:
+        _result_cache[key] = _copy_result(result)
+        _result_cache.move_to_end(key)
+        while len(_result_cache) > RESULT_CACHE_SIZE:
+            _result_cache.popitem(last=False)
+            _result_cache_stats["evictions"] += 1
+
+
+def result_cache_info():
+    """缓存统计：命中/未命中/淘汰次数与条目数"""
+    with _result_cache_lock:
+        return dict(_result_cache_stats, entries=len(_result_cache), max_entries=RESULT_CACHE_SIZE)
+
+
+@timed("scale_pipeline")
+def run_scale_pipeline(answers, on_stage=None):
+    """
+    输入: 67 个原始答案 (Excel 题序)
+    输出: {"scores", "main_diagnosis", "mbti", "elements", "poster_png"}
+    on_stage(stage_name, done, total): 每完成一个阶段回调一次，用于驱动进度条
+    相同答案命中结果缓存时直接跳到海报阶段
+    """
+    total = len(PIPELINE_STAGES)
+
+    def _done(stage):
+        if on_stage is not None:
+            on_stage(stage, PIPELINE_STAGES.index(stage) + 1, total)
+
+    key = tuple(int(a) for a in answers)
+    result = _cache_get(key)
+    if result is None:
+        scores = calculate_scores_vectorized(answers, load_question_bank().spec)
+        _done("scores")
+
+        main_diagnosis = get_diagnosis_result(scores)
+        _done("diagnosis")
+
+        mbti, elements = predict_mbti(constitution_scores=scores, answers=answers)
+        _done("mbti")
+
+        result = {"scores": scores, "main_diagnosis": main_diagnosis, "mbti": mbti, "elements": elements}
+        _cache_put(key, result)
+    else:
+        _done("mbti")
+
+    result["poster_png"] = render_share_png(result["main_diagnosis"], result["mbti"], result["scores"],
+                                            result["elements"])
+    _done("poster")
+    return result
+
+
+def submit_scale_pipeline(answers, on_stage=None):
+    """在后台线程池中运行 run_scale_pipeline，返回 Future"""
+    return _executor.submit(run_scale_pipeline, answers, on_stage)
\ No newline at end of file
@@ -1,20 +1,121 @@
+import os
+import pickle
+import random
+import threading
+from collections import namedtuple
+
+import numpy as np
 import pandas as pd
 import streamlit as st
 
+from utils_metrics import timed
+
+QUESTIONS_PATH = "data/tcm_questions.xlsx"
+
+# 解析后的题库：df 为只读的题目表，spec 为向量化计分所需的 ScoringSpec
+QuestionBank = namedtuple('QuestionBank', ['df', 'spec'])
+
+# 进程级缓存: file_path -> (mtime, QuestionBank)，Streamlit 每次 rerun 不再重复解析 Excel
+_question_bank_cache = {}
+_question_bank_lock = threading.Lock()
+
+
+def _sidecar_path(file_path):
+    """二进制缓存文件，例如 data/tcm_questions.cache.pkl"""
+    return os.path.splitext(file_path)[0] + ".cache.pkl"
+
+
+def _read_sidecar(file_path, mtime):
+    """读取二进制缓存；源文件 mtime 不一致或缓存损坏时返回 None"""
+    try:
+        with open(_sidecar_path(file_path), "rb") as f:
+            payload = pickle.load(f)
+        if payload.get("source_mtime") == mtime:
+            return payload["df"]
+    except Exception:
+        pass
+    return None
+
+
+def _write_sidecar(file_path, mtime, df):
+    """写入二进制缓存 (先写临时文件再原子替换，避免多进程读到半截文件)"""
+    path = _sidecar_path(file_path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"source_mtime": mtime, "df": df}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"[Warning] 题库缓存写入失败: {e}")
+
+
+def _parse_questions(file_path):
+    df = pd.read_excel(file_path)
+    # 如果没有 direction 列，默认设为 1 (正向)
+    if 'direction' not in df.columns:
+        df['direction'] = 1
+    return df
+
+
+def load_question_bank(file_path=QUESTIONS_PATH):
+    """
+    读取并缓存题库 (每个进程只解析一次，按文件 mtime 失效)
+    优先级：内存缓存 > 二进制缓存文件 > 解析 Excel
+    """
+    mtime = os.path.getmtime(file_path)
+    cached = _question_bank_cache.get(file_path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    with _question_bank_lock:
+        cached = _question_bank_cache.get(file_path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
 
-def load_questions(file_path="data/tcm_questions.xlsx"):
-    """读取题目，并处理缺失的 direction 列"""
+        df = _read_sidecar(file_path, mtime)
+        if df is None:
+            df = _parse_questions(file_path)
+            _write_sidecar(file_path, mtime, df)
+
+        bank = QuestionBank(df, build_scoring_spec(df))
+        _question_bank_cache[file_path] = (mtime, bank)
+        return bank
+
+
+@timed("load_questions")
+def load_questions(file_path=QUESTIONS_PATH):
+    """读取题目，并处理缺失的 direction 列 (返回的 DataFrame 为进程内共享，请勿修改)"""
     try:
-        df = pd.read_excel(file_path)
-        # 如果没有 direction 列，默认设为 1 (正向)
-        if 'direction' not in df.columns:
-            df['direction'] = 1
-        return df
+        return load_question_bank(file_path).df
     except Exception as e:
         st.error(f"❌ 读取题库失败，请检查 data/tcm_questions.xlsx 是否存在。\n错误信息: {e}")
         return None
 
 
+# Excel 题序中每种体质所占的题目区间 (阳虚, 阴虚, 气虚, 痰湿, 湿热, 血瘀, 气郁, 特禀, 平和)
+TYPE_SLICES = [(0, 7), (7, 15), (15, 23), (23, 31), (31, 38), (38, 45), (45, 52), (52, 59), (59, 67)]
+
+
+def generate_random_answers(rng=random):
+    """
+    “随机一键填表”的答案生成器：随机选一种体质打高分 (4-5)，其余题目大多为 1-2
+    rng: random 模块或 random.Random 实例 (压测时传入固定种子)
+    """
+    target_type_index = rng.randint(0, 8)
+    base_answers = []
+    for _ in range(67):
+        if rng.random() < 0.8:
+            base_answers.append(rng.randint(1, 2))
+        else:
+            base_answers.append(3)
+
+    start, end = TYPE_SLICES[target_type_index]
+    for i in range(start, end):
+        base_answers[i] = rng.randint(4, 5)
+    return base_answers
+
+
+@timed("calculate_scores")
 def calculate_scores(user_answers_df):
     """
     计算王琦九种体质得分
@@ -49,6 +150,61 @@ def calculate_scores(user_answers_df):
     return results
 
 
+# 向量化计分所需的题库预计算结果
+#   type_names: 体质名称 (按题库中首次出现的顺序，与 calculate_scores 的输出顺序一致)
+#   type_index: (67,) 每题所属体质在 type_names 中的下标
+#   directions: (67,) 计分方向，-1 为反向计分
+#   onehot:     (67, 9) 题目 -> 体质 的 0/1 归属矩阵
+#   counts:     (9,) 每种体质的题数
+ScoringSpec = namedtuple('ScoringSpec', ['type_names', 'type_index', 'directions', 'onehot', 'counts'])
+
+
+def build_scoring_spec(questions_df):
+    """从题库 DataFrame 预计算 ScoringSpec (每份题库只需计算一次)"""
+    type_names = list(pd.unique(questions_df['type']))
+    type_index = np.array([type_names.index(t) for t in questions_df['type']], dtype=np.intp)
+    if 'direction' in questions_df.columns:
+        directions = questions_df['direction'].to_numpy(dtype=np.int64)
+    else:
+        directions = np.ones(len(questions_df), dtype=np.int64)
+
+    onehot = np.zeros((len(type_index), len(type_names)), dtype=np.int64)
+    onehot[np.arange(len(type_index)), type_index] = 1
+    counts = onehot.sum(axis=0)
+    return ScoringSpec(type_names, type_index, directions, onehot, counts)
+
+
+def calculate_scores_matrix(answer_matrix, spec):
+    """
+    向量化的王琦转化分计算
+    输入: (N, 67) 原始答案矩阵 (1-5，未做反向处理)
+    输出: (N, 9) 转化分，列顺序为 spec.type_names
+    """
+    answers = np.asarray(answer_matrix, dtype=np.int64)
+    if answers.ndim == 1:
+        answers = answers[np.newaxis, :]
+
+    # 反向计分: 实际分 = 6 - 原始分
+    final = np.where(spec.directions == -1, 6 - answers, answers)
+    original_sum = final @ spec.onehot
+
+    # 王琦公式: [(原始分 - 题数) / (题数 * 4)] * 100，与 calculate_scores 的运算顺序保持一致
+    converted = ((original_sum - spec.counts) / (spec.counts * 4)) * 100
+    converted = np.clip(converted, 0, 100)
+    return np.round(converted, 2)
+
+
+@timed("calculate_scores")
+def calculate_scores_vectorized(answers, spec):
+    """
+    calculate_scores 的向量化版本
+    输入: 67 个原始答案 (Excel 题序) + ScoringSpec
+    输出: 与 calculate_scores 相同的 {体质: 转化分} 字典
+    """
+    row = calculate_scores_matrix(answers, spec)[0]
+    return {t_type: float(v) for t_type, v in zip(spec.type_names, row)}
+
+
 def get_diagnosis_result(scores):
     """
     (可选) 简单的规则判定，用于在前端显示主次体质
@@ -67,4 +223,27 @@ def get_diagnosis_result(scores):
     if scores.get("平和质", 0) >= 60 and max_score < 40:
         return "平和质"
 
-    return max_type
\ No newline at end of file
+    return max_type
+
+
+def get_diagnosis_results_matrix(score_matrix, type_names):
+    """
+    get_diagnosis_result 的批量版本
+    输入: (N, 9) 转化分 (列顺序为 type_names) 输出: list[str] 每行的主导体质
+    """
+    score_matrix = np.asarray(score_matrix, dtype=np.float64)
+    patho_cols = [i for i, t in enumerate(type_names) if t != "平和质"]
+    if not patho_cols:
+        return ["平和质"] * len(score_matrix)
+
+    patho = score_matrix[:, patho_cols]
+    # argmax 取第一个最大值，与 max(dict, key=...) 的并列处理一致
+    max_idx = np.argmax(patho, axis=1)
+    max_score = patho[np.arange(len(patho)), max_idx]
+    max_types = np.array([type_names[i] for i in patho_cols], dtype=object)[max_idx]
+
+    if "平和质" in type_names:
+        pinghe = score_matrix[:, type_names.index("平和质")]
+        is_pinghe = (pinghe >= 60) & (max_score < 40)
+        max_types = np.where(is_pinghe, "平和质", max_types)
+    return max_types.tolist()
\ No newline at end of file
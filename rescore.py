@@ -0,0 +1,188 @@
+import os
+import argparse
+import time
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+
+from logic_tcm import (load_question_bank, calculate_scores_matrix, get_diagnosis_results_matrix,
+                       calculate_scores_vectorized, get_diagnosis_result)
+from logic_model import SCORE_ORDER, predict_mbti_matrix
+from logic_mapping import predict_mbti
+from logic_elements import ELEMENTS_VARIANT, ELEMENT_NAMES, five_elements_batch
+from utils_storage import RESEARCH_COLUMNS, SCORE_COLUMNS, connect_readonly, iter_research_rows
+from utils_analytics import parse_answer_strings
+
+# ==========================================
+# 离线批量重算：研究数据 -> 追加重算结果列的新 CSV
+# ==========================================
+# 用法：python rescore.py --db research_data.db --output research_data_rescored.csv  (线上数据)
+#       python rescore.py --input research_data.csv --output research_data_rescored.csv  (CSV 导出或旧版文件)
+# 模型 (best_mbti_model.pth) 更新后，用它对全部历史数据重新计分和预测
+# 批量结果与 App 单条路径 (calculate_scores_vectorized + predict_mbti) 的一致性由 --verify 抽样逐行核对：
+# 得分、主导体质、五行用的是同一套公式，应完全相同；MBTI 批量推理与单条推理的浮点求和顺序不同，
+# 两个类别的 logits 几乎相等时 argmax 可能不同，核对结果会如实报告不一致的行数
+
+# 列顺序与 five_elements_batch 的输出一致：木, 火, 土, 金, 水
+ELEMENT_COLUMNS = ["element_mu", "element_huo", "element_tu", "element_jin", "element_shui"]
+RESCORED_SCORE_COLUMNS = [f"rescored_{c}" for c in SCORE_COLUMNS]
+OUTPUT_COLUMNS = (["rescored_valid", "rescored_constitution_main", "rescored_ai_mbti"]
+                  + RESCORED_SCORE_COLUMNS + [f"rescored_{c}" for c in ELEMENT_COLUMNS])
+
+# 超过该大小的输入文件默认启用多进程
+MULTIPROCESS_THRESHOLD_BYTES = 50 * 1024 * 1024
+
+
+def rescore_chunk(chunk):
+    """对一块 DataFrame 重新计算体质得分、主导体质、MBTI 与五行，返回追加了结果列的 DataFrame"""
+    spec = load_question_bank().spec
+    answers, valid = parse_answer_strings(chunk["raw_answers_str"])
+
+    scores = calculate_scores_matrix(answers[valid], spec)
+    main_types = get_diagnosis_results_matrix(scores, spec.type_names)
+
+    # 列顺序转为 SCORE_ORDER (与 SCORE_COLUMNS 一致)
+    order = [spec.type_names.index(t) for t in SCORE_ORDER]
+    ordered_scores = scores[:, order]
+    mbtis = predict_mbti_matrix(ordered_scores, answers[valid])
+    elements = five_elements_batch(ordered_scores, ELEMENTS_VARIANT)
+
+    # 无效行的结果列留空
+    n = len(chunk)
+    full_scores = np.full((n, len(SCORE_ORDER)), np.nan)
+    full_scores[valid] = ordered_scores
+    full_elements = np.zeros((n, len(ELEMENT_COLUMNS)), dtype=np.int64)
+    full_elements[valid] = elements
+    invalid = ~valid
+    full_main = np.full(n, None, dtype=object)
+    full_main[valid] = main_types
+    full_mbti = np.full(n, None, dtype=object)
+    full_mbti[valid] = mbtis
+
+    out = chunk.copy()
+    out["rescored_valid"] = valid
+    out["rescored_constitution_main"] = full_main
+    out["rescored_ai_mbti"] = full_mbti
+    for j, col in enumerate(RESCORED_SCORE_COLUMNS):
+        out[col] = full_scores[:, j]
+    for j, col in enumerate(ELEMENT_COLUMNS):
+        out[f"rescored_{col}"] = pd.arrays.IntegerArray(full_elements[:, j], mask=invalid)
+    return out
+
+
+def _rescore_chunk_to_csv(chunk):
+    """子进程中完成计算与 CSV 序列化，主进程只负责顺序写文件"""
+    return rescore_chunk(chunk).to_csv(header=False, index=False)
+
+
+def verify_chunk(out, n=200):
+    """
+    取 rescore_chunk 输出中的前 n 个有效行，用 App 的单条路径重算并逐行比对
+    返回 {"checked": 行数, "mismatch": {字段: 不一致行数}}
+    """
+    spec = load_question_bank().spec
+    answers, valid = parse_answer_strings(out["raw_answers_str"])
+    mismatch = {"scores": 0, "main": 0, "mbti": 0, "elements": 0}
+    rows = np.flatnonzero(valid)[:n]
+    for i in rows:
+        row_answers = answers[i].tolist()
+        scores = calculate_scores_vectorized(row_answers, spec)
+        mbti, elements = predict_mbti(constitution_scores=scores, answers=row_answers)
+        rec = out.iloc[i]
+        if [scores[t] for t in SCORE_ORDER] != [rec[c] for c in RESCORED_SCORE_COLUMNS]:
+            mismatch["scores"] += 1
+        if get_diagnosis_result(scores) != rec["rescored_constitution_main"]:
+            mismatch["main"] += 1
+        if mbti != rec["rescored_ai_mbti"]:
+            mismatch["mbti"] += 1
+        if [elements[k] for k in ELEMENT_NAMES] != [rec[f"rescored_{c}"] for c in ELEMENT_COLUMNS]:
+            mismatch["elements"] += 1
+    return {"checked": len(rows), "mismatch": mismatch}
+
+
+def iter_chunks(input_path, chunksize):
+    return pd.read_csv(input_path, chunksize=chunksize, dtype={"raw_answers_str": str}, encoding="utf-8-sig")
+
+
+def iter_db_chunks(db_path, chunksize):
+    """
+    按插入顺序分块读取 SQLite 中的线上数据
+    用只读连接，不经过 ResearchStore (其构造函数会建表、写迁移标记，甚至导入当前目录的旧版 CSV)
+    """
+    conn = connect_readonly(db_path)
+    try:
+        batch = []
+        for row in iter_research_rows(conn, batch_size=min(chunksize, 5000)):
+            batch.append(row)
+            if len(batch) >= chunksize:
+                yield pd.DataFrame(batch, columns=RESEARCH_COLUMNS)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=RESEARCH_COLUMNS)
+    finally:
+        conn.close()
+
+
+def rescore_file(input_path, output_path, chunksize=50000, workers=None, from_db=False):
+    """
+    流式读取输入，按块重算并写出；返回处理的总行数
+    from_db=True 时 input_path 为 SQLite 数据库 (research_data.db)，否则为 CSV
+    """
+    if workers is None:
+        workers = os.cpu_count() if os.path.getsize(input_path) > MULTIPROCESS_THRESHOLD_BYTES else 1
+
+    if from_db:
+        columns = list(RESEARCH_COLUMNS)
+        chunks = iter_db_chunks(input_path, chunksize)
+    else:
+        columns = list(pd.read_csv(input_path, nrows=0, encoding="utf-8-sig").columns)
+        chunks = iter_chunks(input_path, chunksize)
+
+    total = 0
+    with open(output_path, "w", newline="", encoding="utf-8-sig") as f:
+        f.write(",".join(columns + OUTPUT_COLUMNS) + "\n")
+
+        def _write(csv_text, n_rows):
+            nonlocal total
+            f.write(csv_text)
+            total += n_rows
+            print(f"[Info] 已处理 {total} 行")
+
+        if workers > 1:
+            with Pool(workers) as pool:
+                for chunk_len, csv_text in pool.imap(_rescore_with_len, chunks):
+                    _write(csv_text, chunk_len)
+        else:
+            for chunk in chunks:
+                _write(_rescore_chunk_to_csv(chunk), len(chunk))
+    return total
+
+
+def _rescore_with_len(chunk):
+    return len(chunk), _rescore_chunk_to_csv(chunk)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="用当前题库与模型批量重算研究数据")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--db', default=None, help="SQLite 数据库 (线上数据，如 research_data.db)")
+    source.add_argument('--input', default='research_data.csv', help="CSV 文件 (导出文件或旧版 research_data.csv)")
+    parser.add_argument('--output', default='research_data_rescored.csv')
+    parser.add_argument('--chunksize', type=int, default=50000, help="每块行数")
+    parser.add_argument('--workers', type=int, default=None, help="进程数 (默认：大文件用全部 CPU，小文件单进程)")
+    parser.add_argument('--verify', type=int, default=0, help="重算后抽取 N 个有效行与 App 单条路径逐行比对")
+    args = parser.parse_args()
+
+    input_path = args.db or args.input
+    if not os.path.exists(input_path):
+        parser.error(f"输入文件不存在: {input_path}")
+
+    start = time.perf_counter()
+    n = rescore_file(input_path, args.output, chunksize=args.chunksize, workers=args.workers, from_db=bool(args.db))
+    print(f"✅ 重算完成: {n} 行，用时 {time.perf_counter() - start:.1f}s -> {args.output}")
+
+    if args.verify:
+        out = pd.read_csv(args.output, nrows=args.verify * 2, dtype={"raw_answers_str": str}, encoding="utf-8-sig")
+        report = verify_chunk(out, args.verify)
+        print(f"[Info] 与单条路径逐行比对 {report['checked']} 行，不一致: {report['mismatch']}")
\ No newline at end of file
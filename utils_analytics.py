@@ -0,0 +1,160 @@
+import os
+import json
+import shutil
+import argparse
+import tempfile
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from utils_storage import RESEARCH_COLUMNS, SCORE_COLUMNS, get_research_store
+
+# ==========================================
+# 研究数据列式存储 (NumPy .npy，可 mmap 零拷贝读取)
+# ==========================================
+# 用法：python utils_analytics.py --out research_columnar
+# 目录结构：
+#   answers.npy    (N, 67) uint8   原始答案 (无效行为 0)
+#   valid.npy      (N,)    bool    raw_answers_str 是否为合法的 67 位 1-5 数字串
+#   scores.npy     (N, 9)  float32 列顺序同 SCORE_COLUMNS
+#   timestamp.npy  (N,)    datetime64[s]
+#   <列名>.npy     (N,)    uint8/uint16 低基数字符串列的编码，类别表见 manifest.json
+#   manifest.json  行数、列信息与类别表
+COLUMNAR_DIR = "research_columnar"
+CATEGORY_COLUMNS = ["consent", "gender", "real_mbti", "ai_mbti", "constitution_main"]
+
+ResearchColumns = namedtuple('ResearchColumns', [
+    'n_rows', 'answers', 'valid', 'scores', 'timestamp', 'codes', 'categories'
+])
+
+
+def parse_answer_strings(answer_strs):
+    """
+    把 raw_answers_str 列解析为 (N, 67) uint8 矩阵
+    返回 (answers, valid)：格式不合法 (长度不是 67 或含 1-5 以外字符) 的行 valid=False，答案置 0
+    """
+    strs = pd.Series(answer_strs, dtype="object").fillna("").astype(str)
+    valid = (strs.str.len() == 67).to_numpy() & strs.str.fullmatch(r"[1-5]+").fillna(False).to_numpy()
+
+    answers = np.zeros((len(strs), 67), dtype=np.uint8)
+    if valid.any():
+        joined = "".join(strs[valid]).encode("ascii")
+        answers[valid] = (np.frombuffer(joined, dtype=np.uint8) - ord("0")).reshape(-1, 67)
+    return answers, valid
+
+
+def compact_research_data(out_dir=COLUMNAR_DIR, store=None, batch_size=50000):
+    """
+    把研究数据库整体转换为列式 .npy 文件 (所有列都分批写入 memmap，内存占用与数据量无关)
+    先写入同级的唯一临时目录，完成后整体替换 out_dir (并发压缩互不干扰)；返回行数
+    """
+    store = store or get_research_store()
+    n_rows = store.count()  # 转换期间新写入的行留给下一次压缩
+
+    parent = os.path.dirname(os.path.abspath(out_dir))
+    tmp_dir = tempfile.mkdtemp(prefix=f"{os.path.basename(os.path.abspath(out_dir))}.", suffix=".tmp", dir=parent)
+    os.chmod(tmp_dir, 0o755)
+    try:
+        offset = _write_columnar(tmp_dir, store, n_rows, batch_size)
+        shutil.rmtree(out_dir, ignore_errors=True)
+        os.replace(tmp_dir, out_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return offset
+
+
+def _write_columnar(tmp_dir, store, n_rows, batch_size):
+    """把前 n_rows 行写入 tmp_dir，返回实际写入的行数"""
+    def _memmap(name, dtype, shape):
+        return np.lib.format.open_memmap(os.path.join(tmp_dir, f"{name}.npy"), mode="w+", dtype=dtype, shape=shape)
+
+    answers = _memmap("answers", np.uint8, (n_rows, 67))
+    valid = _memmap("valid", np.bool_, (n_rows,))
+    scores = _memmap("scores", np.float32, (n_rows, len(SCORE_COLUMNS)))
+    timestamp = _memmap("timestamp", "datetime64[s]", (n_rows,))
+    # 编码先按 uint16 写入临时 memmap，类别数确定后再分块压缩为 uint8
+    codes = {c: _memmap(f"{c}.codes", np.uint16, (n_rows,)) for c in CATEGORY_COLUMNS}
+    categories = {c: {} for c in CATEGORY_COLUMNS}
+
+    offset = 0
+    batch = []
+
+    def _flush(rows):
+        nonlocal offset
+        df = pd.DataFrame(rows, columns=RESEARCH_COLUMNS)
+        end = offset + len(df)
+        answers[offset:end], valid[offset:end] = parse_answer_strings(df["raw_answers_str"])
+        scores[offset:end] = df[SCORE_COLUMNS].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float32)
+        timestamp[offset:end] = pd.to_datetime(df["timestamp"], errors="coerce").to_numpy(dtype="datetime64[s]")
+        for c in CATEGORY_COLUMNS:
+            table = categories[c]
+            codes[c][offset:end] = [table.setdefault(v, len(table)) for v in df[c].fillna("").astype(str)]
+        offset = end
+
+    for row in store.iter_rows(batch_size=batch_size):
+        if offset + len(batch) >= n_rows:
+            break
+        batch.append(row)
+        if len(batch) >= batch_size:
+            _flush(batch)
+            batch = []
+    if batch:
+        _flush(batch)
+
+    for arr in (answers, valid, scores, timestamp):
+        arr.flush()
+    del answers, valid, scores, timestamp
+
+    manifest = {"n_rows": offset, "score_columns": SCORE_COLUMNS, "categories": {}}
+    for c in CATEGORY_COLUMNS:
+        labels = sorted(categories[c], key=categories[c].get)
+        dtype = np.uint8 if len(labels) <= 256 else np.uint16
+        out = _memmap(c, dtype, (offset,))
+        for start in range(0, offset, batch_size):
+            out[start:start + batch_size] = codes[c][start:start + batch_size]
+        out.flush()
+        del out
+        codes[c] = None  # 释放 memmap 后才能删除文件 (Windows)
+        os.remove(os.path.join(tmp_dir, f"{c}.codes.npy"))
+        manifest["categories"][c] = labels
+
+    with open(os.path.join(tmp_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return offset
+
+
+def load_research_columnar(data_dir=COLUMNAR_DIR):
+    """
+    以 mmap 方式零拷贝加载列式数据
+    answers / scores 可直接传给 calculate_scores_matrix、predict_mbti_matrix 等批量接口
+    """
+    with open(os.path.join(data_dir, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    n = manifest["n_rows"]
+
+    def _load(name):
+        return np.load(os.path.join(data_dir, f"{name}.npy"), mmap_mode="r")[:n]
+
+    return ResearchColumns(
+        n_rows=n,
+        answers=_load("answers"),
+        valid=_load("valid"),
+        scores=_load("scores"),
+        timestamp=_load("timestamp"),
+        codes={c: _load(c) for c in CATEGORY_COLUMNS},
+        categories=manifest["categories"],
+    )
+
+
+def decode_category(columns, name):
+    """把编码列还原为字符串数组"""
+    return np.asarray(columns.categories[name], dtype=object)[columns.codes[name]]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="把研究数据库压缩为列式 .npy 文件")
+    parser.add_argument('--out', default=COLUMNAR_DIR)
+    args = parser.parse_args()
+    print(f"✅ 已压缩 {compact_research_data(args.out)} 行 -> {args.out}")
\ No newline at end of file
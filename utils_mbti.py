@@ -0,0 +1,6 @@
+# ==========================================
+# MBTI 类型常量 (不依赖任何第三方库，计分 / 解析 / 存储 / 页面共用)
+# ==========================================
+# 顺序即页面下拉框和素材预热的顺序
+MBTI_TYPES = ["ISTJ", "ISFJ", "INFJ", "INTJ", "ISTP", "ISFP", "INFP", "INTP",
+              "ESTP", "ESFP", "ENFP", "ENTP", "ESTJ", "ESFJ", "ENFJ", "ENTJ"]
\ No newline at end of file
@@ -0,0 +1,205 @@
+import os
+import time
+import bisect
+import threading
+import functools
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ==========================================
+# 分阶段耗时统计 (进程内直方图，可导出 Prometheus 文本格式)
+# ==========================================
+# 用法：
+#   @timed("generate_share_image")          装饰函数
+#   with timed("load_model_resources"): ... 包裹代码块
+# 每次记录只有两次 perf_counter + 一次二分查找 + 一次加锁，开销在微秒级
+#
+# 导出 (可选，环境变量配置)：
+#   CYBERNJ_METRICS_PORT - 在 127.0.0.1:<端口>/metrics 提供 Prometheus 抓取端点
+#   CYBERNJ_METRICS_FILE - 管理员面板刷新时把 Prometheus 文本写入该文件 (供 node_exporter textfile 采集)
+METRICS_PREFIX = "cybernj"
+METRICS_PORT = os.environ.get("CYBERNJ_METRICS_PORT", "").strip()
+METRICS_FILE = os.environ.get("CYBERNJ_METRICS_FILE", "").strip()
+
+# 直方图桶上界 (秒)，覆盖亚毫秒级计分到数秒级模型加载
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """固定桶直方图 (线程安全)，counts 最后一格为 +Inf 桶"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.total += 1
+            self.sum += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.total, self.sum, self.max
+
+    def quantile(self, q, counts=None, total=None):
+        """按桶内线性插值估算分位数 (同 Prometheus histogram_quantile)"""
+        if counts is None:
+            counts, total, _, _ = self.snapshot()
+        if total == 0:
+            return None
+        rank = q * total
+        cumulative = 0
+        for i, c in enumerate(counts):
+            if cumulative + c >= rank and c > 0:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - cumulative) / c
+            cumulative += c
+        return self.buckets[-1]
+
+
+_histograms = {}
+_registry_lock = threading.Lock()
+
+
+def get_histogram(name):
+    hist = _histograms.get(name)
+    if hist is None:
+        with _registry_lock:
+            hist = _histograms.setdefault(name, Histogram())
+    return hist
+
+
+def observe(name, seconds):
+    get_histogram(name).observe(seconds)
+
+
+class timed:
+    """计时器：既可作为装饰器，也可作为 with 上下文管理器"""
+
+    def __init__(self, name):
+        self.name = name
+        self._hist = get_histogram(name)
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._hist.observe(time.perf_counter() - self._start)
+        return False
+
+    def __call__(self, func):
+        hist = self._hist
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                hist.observe(time.perf_counter() - start)
+
+        return wrapper
+
+
+def metrics_summary():
+    """
+    各阶段耗时汇总 (毫秒)，供管理员面板展示
+    返回 {阶段: {"count", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"}}
+    """
+    summary = {}
+    for name, hist in sorted(_histograms.items()):
+        counts, total, total_sum, max_seconds = hist.snapshot()
+        if total == 0:
+            continue
+        # 插值估计可能超过实际最大值，截断到 max
+        q_ms = {q: round(min(hist.quantile(q, counts, total), max_seconds) * 1000, 3) for q in (0.50, 0.95, 0.99)}
+        summary[name] = {
+            "count": total,
+            "mean_ms": round(total_sum / total * 1000, 3),
+            "p50_ms": q_ms[0.50],
+            "p95_ms": q_ms[0.95],
+            "p99_ms": q_ms[0.99],
+            "max_ms": round(max_seconds * 1000, 3),
+        }
+    return summary
+
+
+def render_prometheus():
+    """Prometheus 文本格式 (单个 histogram 指标，stage 标签区分阶段)"""
+    metric = f"{METRICS_PREFIX}_stage_duration_seconds"
+    lines = [
+        f"# HELP {metric} Duration of scoring and rendering pipeline stages.",
+        f"# TYPE {metric} histogram",
+    ]
+    for name, hist in sorted(_histograms.items()):
+        counts, total, total_sum, _ = hist.snapshot()
+        cumulative = 0
+        for le, c in zip(hist.buckets, counts):
+            cumulative += c
+            lines.append(f'{metric}_bucket{{stage="{name}",le="{le}"}} {cumulative}')
+        lines.append(f'{metric}_bucket{{stage="{name}",le="+Inf"}} {total}')
+        lines.append(f'{metric}_sum{{stage="{name}"}} {total_sum}')
+        lines.append(f'{metric}_count{{stage="{name}"}} {total}')
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus_file(path=METRICS_FILE):
+    """把当前指标写入文本文件 (先写临时文件再原子替换)；path 为空时不做任何事"""
+    if not path:
+        return False
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(render_prometheus())
+        os.replace(tmp_path, path)
+        return True
+    except Exception as e:
+        print(f"[Warning] 指标文件写入失败: {e}")
+        return False
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=METRICS_PORT, host="127.0.0.1"):
+    """在后台线程启动 /metrics 端点 (每个进程只启动一次)；port 为空时不启动"""
+    global _server
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, int(port)), _MetricsHandler)
+            except Exception as e:
+                print(f"[Warning] 指标端点启动失败: {e}")
+                return None
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+            print(f"[Info] 指标端点已启动: http://{host}:{port}/metrics")
+        return _server
\ No newline at end of file
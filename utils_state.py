@@ -0,0 +1,174 @@
+import base64
+import os
+import re
+import secrets
+import threading
+import time
+import zlib
+from collections import OrderedDict, namedtuple
+
+# ==========================================
+# 答题进度的 URL 编码 (st.query_params["d"])
+# ==========================================
+# 旧格式：67 位十进制数字串，每题一位 (1-5)
+# 新格式：base64url(版本号 1 字节 + 答案 20 字节 + CRC 校验 2 字节) = 31 个字符
+#   67 个 1-5 的答案按 5 进制打包成一个整数 (5^67 < 2^160)，正好放进 20 字节
+# decode_answers 两种格式都能识别，旧链接继续有效
+STATE_VERSION = 1
+N_QUESTIONS = 67
+_PAYLOAD_BYTES = 20
+_CHECKSUM_BYTES = 2
+
+
+def _checksum(data):
+    return (zlib.crc32(data) & 0xFFFF).to_bytes(_CHECKSUM_BYTES, "big")
+
+
+def encode_answers(answers):
+    """67 个 1-5 的答案 -> 31 个字符的 base64url 字符串"""
+    if len(answers) != N_QUESTIONS:
+        raise ValueError(f"答案数量应为 {N_QUESTIONS}，实际为 {len(answers)}")
+
+    value = 0
+    for a in reversed(answers):
+        a = int(a)
+        if not 1 <= a <= 5:
+            raise ValueError(f"答案取值应为 1-5，实际为 {a}")
+        value = value * 5 + (a - 1)
+
+    body = bytes([STATE_VERSION]) + value.to_bytes(_PAYLOAD_BYTES, "big")
+    return base64.urlsafe_b64encode(body + _checksum(body)).rstrip(b"=").decode("ascii")
+
+
+def decode_answers(token):
+    """
+    URL 参数 -> 67 个答案列表；兼容旧的 67 位数字串
+    格式不合法、版本不识别或校验失败时返回 None
+    """
+    if not token:
+        return None
+
+    if len(token) == N_QUESTIONS and token.isdigit():
+        answers = [int(c) for c in token]
+        return answers if all(1 <= a <= 5 for a in answers) else None
+
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    except (ValueError, TypeError):
+        return None
+    if len(raw) != 1 + _PAYLOAD_BYTES + _CHECKSUM_BYTES or raw[0] != STATE_VERSION:
+        return None
+    body, checksum = raw[:-_CHECKSUM_BYTES], raw[-_CHECKSUM_BYTES:]
+    if _checksum(body) != checksum:
+        return None
+    # base64 末尾字符的填充位不参与解码，要求字符串与重新编码的结果完全一致
+    if base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii") != token:
+        return None
+
+    value = int.from_bytes(body[1:], "big")
+    answers = []
+    for _ in range(N_QUESTIONS):
+        value, digit = divmod(value, 5)
+        answers.append(digit + 1)
+    return answers if value == 0 else None
+
+# ==========================================
+# 服务端进度存档 (微信 / QQ 内置浏览器经常丢 URL 参数)
+# ==========================================
+# 以短续填码 (URL 参数 t) 为键，保存半份答案和已完成的结果；
+# 带着 t 回来的会话直接恢复答案，已完成的会话连计分和海报都不用重算。
+# 有界 LRU + TTL：条目数不超过 max_entries，最久未访问的先淘汰。
+# 答案按 encode_answers 压缩为 31 字符保存，半份问卷每条只占几百字节，
+# 数万个并发会话的内存占用也在几十 MB 以内。
+CHECKPOINT_MAX_ENTRIES = int(os.environ.get("CYBERNJ_CHECKPOINT_MAX", "50000"))
+CHECKPOINT_TTL_SECONDS = float(os.environ.get("CYBERNJ_CHECKPOINT_TTL_HOURS", "24")) * 3600
+
+# 续填码：secrets.token_urlsafe(6) 生成的 8 个 base64url 字符；URL 里其他形状的 t 一律不认
+TOKEN_LENGTH = 8
+_TOKEN_PATTERN = re.compile(rf"[A-Za-z0-9_-]{{{TOKEN_LENGTH}}}")
+
+# answers: 67 个答案列表；result: {"scores", "main_diagnosis", "mbti", "elements"} 或 None
+Checkpoint = namedtuple('Checkpoint', ['answers', 'result'])
+
+# 结果中需要存档的字段 (海报 PNG 不存，恢复时由 render_share_png 的缓存或重绘提供)
+CHECKPOINT_RESULT_KEYS = ("scores", "main_diagnosis", "mbti", "elements")
+
+
+class CheckpointStore:
+    """进程内有界 LRU 存档 (线程安全)，条目: token -> (过期时间, 压缩后的答案, 结果)"""
+
+    def __init__(self, max_entries=CHECKPOINT_MAX_ENTRIES, ttl_seconds=CHECKPOINT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def new_token():
+        """8 个字符的随机续填码"""
+        return secrets.token_urlsafe(TOKEN_LENGTH * 3 // 4)
+
+    @staticmethod
+    def is_valid_token(token):
+        """是否为 new_token 形状的续填码 (防止构造的 URL 写入任意长度的键)"""
+        return isinstance(token, str) and _TOKEN_PATTERN.fullmatch(token) is not None
+
+    def _expire(self, now):
+        # 每次写入都会把条目移到末尾并刷新过期时间，所以过期条目总是集中在开头
+        while self._entries:
+            token, (expires_at, _, _) = next(iter(self._entries.items()))
+            if expires_at > now:
+                break
+            del self._entries[token]
+
+    def save(self, token, answers=None, result=None):
+        """写入或更新存档；answers / result 为 None 时保留已有值"""
+        if not self.is_valid_token(token):
+            raise ValueError(f"续填码格式不正确: {token!r}")
+        packed = encode_answers(answers) if answers is not None else None
+        if result is not None:
+            result = {k: result[k] for k in CHECKPOINT_RESULT_KEYS}
+        now = time.monotonic()
+        with self._lock:
+            old = self._entries.pop(token, None)
+            if old is not None:
+                packed = packed if packed is not None else old[1]
+                # 答案变了，旧结果作废
+                if result is None and packed == old[1]:
+                    result = old[2]
+            self._entries[token] = (now + self.ttl_seconds, packed, result)
+            self._expire(now)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def load(self, token):
+        """读取存档并刷新其有效期；续填码格式不对、不存在或已过期时返回 None"""
+        if not self.is_valid_token(token):
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[0] <= now:
+                self._entries.pop(token, None)
+                return None
+            self._entries.move_to_end(token)
+            self._entries[token] = (now + self.ttl_seconds, entry[1], entry[2])
+        answers = decode_answers(entry[1]) if entry[1] is not None else None
+        return Checkpoint(answers, dict(entry[2]) if entry[2] is not None else None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_checkpoint_store = None
+_checkpoint_lock = threading.Lock()
+
+
+def get_checkpoint_store():
+    """进程级单例"""
+    global _checkpoint_store
+    if _checkpoint_store is None:
+        with _checkpoint_lock:
+            if _checkpoint_store is None:
+                _checkpoint_store = CheckpointStore()
+    return _checkpoint_store
\ No newline at end of file
@@ -0,0 +1,565 @@
+import atexit
+import csv
+import gzip
+import io
+import os
+import queue
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from utils_metrics import timed
+from utils_mbti import MBTI_TYPES
+
+
+# ==========================================
+# 研究数据存储 (SQLite WAL，替代直接追加 CSV)
+# ==========================================
+DB_PATH = "research_data.db"
+LEGACY_CSV_PATH = "research_data.csv"
+
+# research_meta 表中的一次性任务标记：旧版 CSV 已迁移 / 聚合统计已补算
+_LEGACY_MIGRATED_KEY = "legacy_csv_migrated"
+_STATS_BACKFILLED_KEY = "stats_backfilled"
+
+# 与旧版 research_data.csv 完全一致的列顺序
+RESEARCH_COLUMNS = [
+    "timestamp", "consent", "gender", "real_mbti",
+    "ai_mbti", "constitution_main",
+    "score_pinghe", "score_qixu", "score_yangxu", "score_yinxu",
+    "score_tanshi", "score_shire", "score_xueyu", "score_qiyu", "score_tebing",
+    "raw_answers_str"
+]
+SCORE_COLUMNS = RESEARCH_COLUMNS[6:15]
+
+MBTI_LABELS = frozenset(MBTI_TYPES)
+
+# 导出格式 -> (文件扩展名, MIME)；parquet 需要可选依赖 pyarrow
+EXPORT_FORMATS = {
+    "csv": (".csv", "text/csv"),
+    "csv.gz": (".csv.gz", "application/gzip"),
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+}
+
+
+def connect_readonly(db_path=DB_PATH):
+    """
+    只读连接 (离线工具用)：不建表、不迁移、不写标记，也不会拿写锁
+    数据库文件不存在时抛出 sqlite3.OperationalError，而不是新建一个空库
+    """
+    return sqlite3.connect(Path(db_path).resolve().as_uri() + "?mode=ro", uri=True, timeout=30)
+
+
+def iter_research_rows(conn, batch_size=1000, start_date=None, end_date=None, consent=None):
+    """在给定连接上按插入顺序分批读取行；参数与返回同 ResearchStore.iter_rows"""
+    where, params = [], []
+    if start_date is not None:
+        where.append("timestamp >= ?")
+        params.append(start_date.strftime("%Y-%m-%d"))
+    if end_date is not None:
+        where.append("timestamp < ?")
+        params.append((end_date + timedelta(days=1)).strftime("%Y-%m-%d"))
+    if consent is not None:
+        where.append("consent = ?")
+        params.append("Yes" if consent else "No")
+
+    sql = f"SELECT {', '.join(RESEARCH_COLUMNS)} FROM research"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY id"
+
+    cursor = conn.execute(sql, params)
+    while True:
+        batch = cursor.fetchmany(batch_size)
+        if not batch:
+            break
+        yield from batch
+
+
+class ResearchStore:
+    """
+    进程内共享一个 SQLite 连接，WAL 模式下多个 Streamlit worker 可并发写入，
+    写操作在进程内用锁串行化，跨进程由 SQLite 文件锁保证行不会交错。
+    """
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+
+        # isolation_level=None: 手动控制事务，批量写入时一次 COMMIT
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=30000")
+
+        column_defs = ", ".join(
+            f"{c} REAL" if c in SCORE_COLUMNS else f"{c} TEXT" for c in RESEARCH_COLUMNS
+        )
+        self._conn.execute(f"CREATE TABLE IF NOT EXISTS research (id INTEGER PRIMARY KEY AUTOINCREMENT, {column_defs})")
+
+        self._conn.execute("CREATE TABLE IF NOT EXISTS research_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+        # 先补算聚合 (新库时表为空，瞬间完成)，再迁移旧版 CSV (迁移时聚合随行增量更新)
+        self._backfill_stats()
+        n = self._migrate_legacy_csv()
+        if n:
+            print(f"[Info] 已从 {LEGACY_CSV_PATH} 迁移 {n} 条记录到 {db_path}")
+
+    def _backfill_stats(self):
+        """
+        聚合统计表：与数据行在同一事务中增量更新，看板查询不再扫描全表
+        建表、检查标记、全表补算、写标记在同一个 BEGIN IMMEDIATE 事务里：
+        补算期间其他 worker 的写入会等待，补算完成后再在新的聚合上累加，计数不会丢失；
+        多个 worker 同时启动时只有一个会补算。
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS research_stats (key TEXT PRIMARY KEY, value REAL NOT NULL)"
+                )
+                done = self._conn.execute(
+                    "SELECT 1 FROM research_meta WHERE key = ?", (_STATS_BACKFILLED_KEY,)
+                ).fetchone() is not None
+                if not done:
+                    self._rebuild_stats_locked()
+                    self._set_marker(_STATS_BACKFILLED_KEY)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _set_marker(self, key):
+        """写入一次性任务标记 (调用方持有 self._lock 且已开启事务)"""
+        self._conn.execute(
+            "INSERT INTO research_meta (key, value) VALUES (?, ?)",
+            (key, datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+        )
+
+    def _migrate_legacy_csv(self):
+        """
+        一次性迁移旧版 CSV，返回导入行数
+        检查标记、导入、写标记在同一个 BEGIN IMMEDIATE 事务里：多个 worker 同时启动时只有一个会导入；
+        导入失败整体回滚 (不留下标记)，下次启动重试。
+        没有标记但已有数据的库 (标记表出现之前建的) 视为已迁移，只补写标记。
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                n = 0
+                done = self._conn.execute(
+                    "SELECT 1 FROM research_meta WHERE key = ?", (_LEGACY_MIGRATED_KEY,)
+                ).fetchone() is not None
+                if not done:
+                    empty = self._conn.execute("SELECT 1 FROM research LIMIT 1").fetchone() is None
+                    if empty and os.path.exists(LEGACY_CSV_PATH):
+                        n = self._insert_csv(LEGACY_CSV_PATH)
+                    self._set_marker(_LEGACY_MIGRATED_KEY)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return n
+
+    def append(self, row):
+        """写入一行 (列顺序同 RESEARCH_COLUMNS)"""
+        self.append_many([row])
+
+    def _insert(self, rows):
+        """写入数据行并更新聚合 (调用方持有 self._lock 且已开启事务)"""
+        self._conn.executemany(_INSERT_SQL, rows)
+        self._conn.executemany(_STATS_UPSERT_SQL, _stats_deltas(rows).items())
+
+    def _insert_csv(self, csv_path, batch_size=5000):
+        """分块写入旧版 CSV 的全部行 (调用方持有 self._lock 且已开启事务)，返回行数"""
+        with open(csv_path, "r", newline="", encoding="utf-8-sig") as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header != RESEARCH_COLUMNS:
+                raise ValueError(f"{csv_path} 列名与 RESEARCH_COLUMNS 不一致")
+            n, batch = 0, []
+            for row in reader:
+                if len(row) != len(RESEARCH_COLUMNS):
+                    continue
+                batch.append(tuple(row))
+                if len(batch) >= batch_size:
+                    self._insert(batch)
+                    n += len(batch)
+                    batch = []
+            if batch:
+                self._insert(batch)
+                n += len(batch)
+        return n
+
+    @timed("research_store_write")
+    def append_many(self, rows):
+        """在同一个事务里批量写入多行"""
+        rows = [tuple(r) for r in rows]
+        if not rows:
+            return 0
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._insert(rows)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def _rebuild_stats_locked(self, batch_size=5000):
+        """全表扫描重算聚合 (调用方持有 self._lock 且已开启写事务，扫描期间没有其他写入)"""
+        deltas = defaultdict(float)
+        cursor = self._conn.execute(f"SELECT {', '.join(RESEARCH_COLUMNS)} FROM research ORDER BY id")
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            for k, v in _stats_deltas(batch).items():
+                deltas[k] += v
+        self._conn.execute("DELETE FROM research_stats")
+        self._conn.executemany(_STATS_UPSERT_SQL, deltas.items())
+
+    def rebuild_stats(self):
+        """全表扫描重算聚合统计 (仅在统计损坏时需要手动调用；旧库升级由 _backfill_stats 自动完成)"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._rebuild_stats_locked()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def get_stats(self):
+        """
+        读取聚合统计 (读取量与历史数据量无关)
+        返回:
+          n: 总记录数
+          constitution: {主导体质: 人数}
+          consent: {Yes/No: 人数}
+          score_mean / score_std: {性别或 "全部": {分数列: 值}}
+          confusion: {(real_mbti, ai_mbti): 人数}，仅统计填写了真实 MBTI 的记录
+          agreement: AI 预测与真实 MBTI 一致的比例 (无样本时为 None)
+        """
+        with self._lock:
+            items = self._conn.execute("SELECT key, value FROM research_stats").fetchall()
+
+        stats = {"n": 0, "constitution": {}, "consent": {}, "score_mean": {}, "score_std": {}, "confusion": {}}
+        sums, squares, scored = defaultdict(dict), defaultdict(dict), {}
+        for key, value in items:
+            kind, *parts = key.split("|")
+            if kind == "n":
+                stats["n"] = int(value)
+            elif kind == "main":
+                stats["constitution"][parts[0]] = int(value)
+            elif kind == "consent":
+                stats["consent"][parts[0]] = int(value)
+            elif kind == "scored":
+                scored[parts[0]] = value
+            elif kind == "sum":
+                sums[parts[0]][parts[1]] = value
+            elif kind == "sq":
+                squares[parts[0]][parts[1]] = value
+            elif kind == "cm":
+                stats["confusion"][(parts[0], parts[1])] = int(value)
+
+        for group, n in scored.items():
+            if n <= 0:
+                continue
+            means = {c: sums[group].get(c, 0.0) / n for c in SCORE_COLUMNS}
+            stats["score_mean"][group] = means
+            stats["score_std"][group] = {
+                c: max(squares[group].get(c, 0.0) / n - means[c] ** 2, 0.0) ** 0.5 for c in SCORE_COLUMNS
+            }
+
+        labelled = sum(stats["confusion"].values())
+        matched = sum(v for (real, ai), v in stats["confusion"].items() if real == ai)
+        stats["agreement"] = matched / labelled if labelled else None
+        return stats
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM research").fetchone()[0]
+
+    def iter_rows(self, batch_size=1000, start_date=None, end_date=None, consent=None):
+        """
+        按插入顺序分批读取行 (每行为 RESEARCH_COLUMNS 顺序的 tuple)
+        start_date / end_date: datetime.date，闭区间；consent: True 仅同意 / False 仅拒绝 / None 全部
+        """
+        # 读取用独立连接，避免长时间占用写锁
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            yield from iter_research_rows(conn, batch_size, start_date, end_date, consent)
+        finally:
+            conn.close()
+
+    def _iter_batches(self, batch_size, **filters):
+        batch = []
+        for row in self.iter_rows(batch_size=batch_size, **filters):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def export_to_file(self, fileobj, fmt="csv", batch_size=5000, **filters):
+        """
+        分块把 (可选过滤后的) 数据写入二进制文件对象，内存占用与数据总量无关
+        fmt: EXPORT_FORMATS 中的一种；filters 同 iter_rows
+        """
+        if fmt == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            schema = pa.schema([
+                (c, pa.float64() if c in SCORE_COLUMNS else pa.string()) for c in RESEARCH_COLUMNS
+            ])
+            with pq.ParquetWriter(fileobj, schema, compression="zstd") as pq_writer:
+                for batch in self._iter_batches(batch_size, **filters):
+                    columns = list(zip(*batch))
+                    pq_writer.write_table(pa.table(
+                        [pa.array(col, type=schema.field(i).type) for i, col in enumerate(columns)], schema=schema
+                    ))
+            return
+
+        if fmt == "csv.gz":
+            raw = gzip.GzipFile(fileobj=fileobj, mode="wb")
+        elif fmt == "csv":
+            raw = fileobj
+        else:
+            raise ValueError(f"不支持的导出格式: {fmt}")
+
+        text = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="", write_through=True)
+        try:
+            writer = csv.writer(text)
+            writer.writerow(RESEARCH_COLUMNS)
+            for batch in self._iter_batches(batch_size, **filters):
+                writer.writerows(batch)
+            text.flush()
+        finally:
+            text.detach()
+            if raw is not fileobj:
+                raw.close()
+
+    def export_bytes(self, fmt="csv", **filters):
+        """
+        分块生成导出文件并返回其字节串，可直接作为 st.download_button 的 data
+        生成阶段写入磁盘临时文件 (不随数据量占用内存)，最后一次性读回；
+        Streamlit 下发前本来就会把整个文件读入内存，所以峰值内存约为导出文件大小的一份
+        """
+        fd, tmp_path = tempfile.mkstemp(suffix=EXPORT_FORMATS[fmt][0])
+        try:
+            with os.fdopen(fd, "wb") as f:
+                self.export_to_file(f, fmt=fmt, **filters)
+            with open(tmp_path, "rb") as f:
+                return f.read()
+        finally:
+            os.remove(tmp_path)
+
+    def export_csv(self):
+        """导出为与旧版 research_data.csv 相同格式的 CSV 字节串 (utf-8-sig)"""
+        buf = io.BytesIO()
+        self.export_to_file(buf, fmt="csv")
+        return buf.getvalue()
+
+    def import_csv(self, csv_path):
+        """在一个事务里导入旧版格式的 CSV 文件 (失败时整体回滚)，返回导入行数"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                n = self._insert_csv(csv_path)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return n
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_INSERT_SQL = (
+    f"INSERT INTO research ({', '.join(RESEARCH_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * len(RESEARCH_COLUMNS))})"
+)
+
+_STATS_UPSERT_SQL = (
+    "INSERT INTO research_stats (key, value) VALUES (?, ?) "
+    "ON CONFLICT(key) DO UPDATE SET value = value + excluded.value"
+)
+
+
+def _stats_deltas(rows):
+    """
+    计算一批行对聚合统计的增量 {key: delta}
+    key 格式: n / main|体质 / consent|Yes / scored|分组 / sum|分组|列 / sq|分组|列 / cm|真实|预测
+    分组为性别或 "全部"
+    """
+    deltas = defaultdict(float)
+    for row in rows:
+        rec = dict(zip(RESEARCH_COLUMNS, row))
+        deltas["n"] += 1
+        deltas[f"main|{rec['constitution_main']}"] += 1
+        deltas[f"consent|{rec['consent']}"] += 1
+
+        try:
+            scores = [float(rec[c]) for c in SCORE_COLUMNS]
+        except (TypeError, ValueError):
+            scores = None
+        if scores is not None:
+            for group in ("全部", rec["gender"]):
+                deltas[f"scored|{group}"] += 1
+                for c, v in zip(SCORE_COLUMNS, scores):
+                    deltas[f"sum|{group}|{c}"] += v
+                    deltas[f"sq|{group}|{c}"] += v * v
+
+        if rec["real_mbti"] in MBTI_LABELS:
+            deltas[f"cm|{rec['real_mbti']}|{rec['ai_mbti']}"] += 1
+    return deltas
+
+
+_store_instance = None
+_store_lock = threading.Lock()
+
+
+def get_research_store():
+    """进程级单例"""
+    global _store_instance
+    if _store_instance is None:
+        with _store_lock:
+            if _store_instance is None:
+                _store_instance = ResearchStore(DB_PATH)
+    return _store_instance
+
+
+# ==========================================
+# 后台写入线程 (把磁盘 IO 移出请求路径)
+# ==========================================
+class ResearchWriter:
+    """
+    进程级后台写入线程：submit() 只把行放进有界队列后立即返回。
+    写线程取到一行后，把队列里已有的行 (最多共 batch_size 行) 一起交给 store.append_many，
+    不额外等待凑批，低负载时延迟最低，高负载时批次自然变大；
+    flush_interval 只是队列空闲时的轮询间隔。
+    stats: enqueued 入队 / written 已写 / backpressure 队列满等待过 / rejected 队列满退回调用方 /
+           errors 写入失败 / dropped 关闭时仍未写入
+    """
+
+    def __init__(self, store, max_queue=10000, batch_size=200, flush_interval=0.5):
+        self.store = store
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stats_lock = threading.Lock()
+        self._closed = False
+        self.stats = {"enqueued": 0, "written": 0, "backpressure": 0, "rejected": 0, "errors": 0, "dropped": 0}
+
+        self._thread = threading.Thread(target=self._run, name="research-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _incr(self, key, n=1):
+        with self._stats_lock:
+            self.stats[key] += n
+
+    def submit(self, row, timeout=0.05):
+        """
+        入队一行。队列满时最多等待 timeout 秒 (记为 backpressure)，
+        仍然满则不入队并返回 False (记为 rejected)，由调用方决定是否同步写入。
+        """
+        if self._closed:
+            return False
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self._incr("backpressure")
+            try:
+                self._queue.put(row, timeout=timeout)
+            except queue.Full:
+                self._incr("rejected")
+                print(f"[Warning] 研究数据写入队列已满 ({self._queue.maxsize})，本条退回调用方。")
+                return False
+        self._incr("enqueued")
+        return True
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            if first is None:
+                self._queue.task_done()
+                return
+
+            batch = [first]
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            try:
+                self.store.append_many(batch)
+                self._incr("written", len(batch))
+            except Exception as e:
+                self._incr("errors", len(batch))
+                print(f"[Error] 研究数据批量写入失败 ({len(batch)} 条): {e}")
+            finally:
+                for _ in range(len(batch) + (1 if stop else 0)):
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def flush(self):
+        """阻塞直到当前队列中的数据全部落盘"""
+        self._queue.join()
+
+    def close(self, timeout=10):
+        """
+        停止接收新数据，写完队列中剩余的行后退出 (注册在 atexit)
+        最多等待 timeout 秒；写线程卡住时不再阻塞退出，未写入的行数记为 dropped 并打印
+        """
+        if self._closed:
+            return
+        self._closed = True
+        deadline = time.monotonic() + timeout
+        try:
+            self._queue.put(None, timeout=timeout)
+            stop_queued = True
+        except queue.Full:
+            stop_queued = False
+        self._thread.join(max(deadline - time.monotonic(), 0))
+        if self._thread.is_alive():
+            left = max(self._queue.qsize() - (1 if stop_queued else 0), 0)
+            self._incr("dropped", left)
+            print(f"[Error] 研究数据写入线程 {timeout}s 内未结束，约 {left} 条未写入 (另有正在写入的一批结果未知)")
+
+
+_writer_instance = None
+
+
+def get_research_writer():
+    """进程级单例"""
+    global _writer_instance
+    if _writer_instance is None:
+        store = get_research_store()
+        with _store_lock:
+            if _writer_instance is None:
+                _writer_instance = ResearchWriter(store)
+    return _writer_instance
\ No newline at end of file
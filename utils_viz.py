@@ -4,8 +4,14 @@ import pandas as pd
 from PIL import Image, ImageDraw, ImageFont
 import math
 import os
+import threading
+from collections import OrderedDict, namedtuple
+from io import BytesIO
 import qrcode
 
+from utils_metrics import timed
+from utils_mbti import MBTI_TYPES
+
 
 # ==========================================
 # 1. 五行雷达图 (Visual Optimization)
@@ -108,75 +114,145 @@ def plot_bar(scores_dict):
 
 
 # ==========================================
-# 3. 生成分享海报 (终极版：含真实二维码)
+# 3. 字体注册表 (进程内只解析一次字体文件，每个字号只加载一次)
 # ==========================================
-def generate_share_image(main_diagnosis, mbti, scores, elements):
-    """
-    绘制包含 MBTI 图片、五行雷达图、完整得分、真实二维码和免责声明的诊断单
-    """
-    # ==========================================
-    # 0. 配置部分 (DEPLOY时修改这里!)
-    # ==========================================
-    # 部署后的 Streamlit App 真实网址
-    SHARE_URL = "https://cybernj-2026.streamlit.app"
+# 优先级：项目根目录字体 > 系统中文字体 (Noto CJK / 文泉驿) > DejaVu (无中文字形) > 默认
+FONT_CANDIDATES = [
+    "SimHei.ttf", "msyh.ttc", "PingFang.ttc",
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/truetype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/truetype/wqy/wqy-microhei.ttc",
+    "/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+]
+
+_font_path = None
+_font_cache = {}  # size -> FreeTypeFont
+_font_lock = threading.Lock()
+
+
+def _resolve_font_path():
+    """按 FONT_CANDIDATES 顺序找到第一个存在的字体文件 (结果缓存)"""
+    global _font_path
+    if _font_path is None:
+        for f in FONT_CANDIDATES:
+            if os.path.exists(f) or os.path.exists(os.path.join(os.getcwd(), f)):
+                _font_path = f
+                break
+        else:
+            _font_path = "arial.ttf"  # 如果没找到任何中文字体，假定一个英文
+    return _font_path
+
+
+def get_font(size):
+    """返回指定字号的字体对象；同一字号在进程内共享，加载失败时回退到默认字体"""
+    font = _font_cache.get(size)
+    if font is not None:
+        return font
+    with _font_lock:
+        font = _font_cache.get(size)
+        if font is None:
+            try:
+                font = ImageFont.truetype(_resolve_font_path(), size)
+            except Exception:
+                # 回退模式
+                font = ImageFont.load_default()
+            _font_cache[size] = font
+    return font
 
-    # ----------------------------------
-    # 1. 画布配置
-    # ----------------------------------
-    width, height = 800, 1600
-    img = Image.new('RGB', (width, height), color=(255, 255, 255))
-    draw = ImageDraw.Draw(img)
 
-    # ----------------------------------
-    # 2. 字体加载 (适配云端 Linux 环境)
-    # ----------------------------------
-    # 优先级：项目根目录字体 > 系统字体 > 默认
-    font_files = ["SimHei.ttf", "msyh.ttc", "PingFang.ttc", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"]
-    valid_font = None
+# ==========================================
+# 3.1 MBTI 原型图缓存 (16 张图只解码、缩放一次，海报与页面共用)
+# ==========================================
+MBTI_ASSET_DIR = "assets/mbti"
+POSTER_MBTI_BOX = (360, 320)
+# 页面上以 width=200 显示，按 2 倍尺寸预缩放以兼顾高分屏
+PREVIEW_MBTI_WIDTH = 400
+
+# poster: 海报用 RGBA 图 (解码失败时为 None)；preview_png: 页面预览用 PNG 字节串
+MBTIAsset = namedtuple('MBTIAsset', ['poster', 'preview_png'])
 
-    for f in font_files:
-        if os.path.exists(f) or os.path.exists(os.path.join(os.getcwd(), f)):
-            valid_font = f
-            break
+_mbti_asset_cache = {}  # mbti -> MBTIAsset，图片文件不存在时为 None
+_mbti_asset_lock = threading.Lock()
 
-    # 如果没找到任何中文字体，使用默认
-    if valid_font is None:
-        valid_font = "arial.ttf"  # 假定一个英文
 
+def _load_mbti_asset(mbti):
+    path = os.path.join(MBTI_ASSET_DIR, f"{mbti}.png")
+    if not os.path.exists(path):
+        return None
     try:
-        # 调整字号
-        font_title_main = ImageFont.truetype(valid_font, 40)  # 标题缩小防止截断
-        font_subtitle = ImageFont.truetype(valid_font, 24)
+        src = Image.open(path).convert("RGBA")
+    except Exception:
+        return MBTIAsset(None, None)
 
-        font_card_label = ImageFont.truetype(valid_font, 26)
-        font_card_val = ImageFont.truetype(valid_font, 72)
+    poster = src.copy()
+    poster.thumbnail(POSTER_MBTI_BOX)
 
-        font_section = ImageFont.truetype(valid_font, 40)
+    preview = src.copy()
+    preview.thumbnail((PREVIEW_MBTI_WIDTH, PREVIEW_MBTI_WIDTH * src.height // max(src.width, 1)))
+    buf = BytesIO()
+    preview.save(buf, format="PNG")
+    return MBTIAsset(poster, buf.getvalue())
 
-        font_list_name = ImageFont.truetype(valid_font, 32)
-        font_list_score = ImageFont.truetype(valid_font, 28)
 
-        font_radar = ImageFont.truetype(valid_font, 30)
+def get_mbti_asset(mbti):
+    """返回 MBTIAsset；图片不存在时返回 None。返回的图片为共享对象，只读使用"""
+    if mbti in _mbti_asset_cache:
+        return _mbti_asset_cache[mbti]
+    with _mbti_asset_lock:
+        if mbti not in _mbti_asset_cache:
+            _mbti_asset_cache[mbti] = _load_mbti_asset(mbti)
+        return _mbti_asset_cache[mbti]
 
-        # 底部专用
-        font_slogan = ImageFont.truetype(valid_font, 34)
-        font_disclaimer = ImageFont.truetype(valid_font, 18)
-        font_copyright = ImageFont.truetype(valid_font, 18)
-        font_qr_label = ImageFont.truetype(valid_font, 20)
-    except:
-        # 回退模式
-        font_title_main = ImageFont.load_default()
-        font_subtitle = ImageFont.load_default()
-        font_card_label = ImageFont.load_default()
-        font_card_val = ImageFont.load_default()
-        font_section = ImageFont.load_default()
-        font_list_name = ImageFont.load_default()
-        font_list_score = ImageFont.load_default()
-        font_radar = ImageFont.load_default()
-        font_slogan = ImageFont.load_default()
-        font_disclaimer = ImageFont.load_default()
-        font_copyright = ImageFont.load_default()
-        font_qr_label = ImageFont.load_default()
+
+def warm_up_mbti_assets():
+    """预热：启动时一次性解码并缩放全部 16 张原型图，返回成功加载的数量"""
+    return sum(1 for mbti in MBTI_TYPES if get_mbti_asset(mbti) is not None)
+
+
+# ==========================================
+# 4. 生成分享海报 (终极版：含真实二维码)
+# ==========================================
+# 0. 配置部分 (DEPLOY时修改这里!)
+# 部署后的 Streamlit App 真实网址
+SHARE_URL = "https://cybernj-2026.streamlit.app"
+
+# 画布与布局常量 (静态底图与动态内容共用)
+POSTER_WIDTH, POSTER_HEIGHT = 800, 1600
+CARD_Y_START = 200
+CARD_HEIGHT = 160
+VIZ_Y_START = 400
+RADAR_CX, RADAR_CY = 600, VIZ_Y_START + 160
+RADAR_RADIUS = 150
+RADAR_ANGLES = [-90, -18, 54, 126, 198]
+LIST_Y_START = 800
+FOOTER_START_Y = 1260
+
+_poster_base = None
+_poster_base_lock = threading.Lock()
+
+
+def _build_poster_base():
+    """
+    绘制所有用户都相同的静态底图：头部、卡片底框、雷达背景与轴线、
+    得分列表标题、二维码、标语、免责声明与版权信息
+    """
+    width, height = POSTER_WIDTH, POSTER_HEIGHT
+    img = Image.new('RGB', (width, height), color=(255, 255, 255))
+    draw = ImageDraw.Draw(img)
+
+    font_title_main = get_font(40)  # 标题缩小防止截断
+    font_subtitle = get_font(24)
+    font_card_label = get_font(26)
+    font_section = get_font(40)
+    font_radar = get_font(30)
+
+    # 底部专用
+    font_slogan = get_font(34)
+    font_disclaimer = get_font(18)
+    font_copyright = get_font(18)
+    font_qr_label = get_font(20)
 
     # ----------------------------------
     # 3. 头部设计
@@ -189,61 +265,31 @@ def generate_share_image(main_diagnosis, mbti, scores, elements):
     draw.line([(40, 165), (760, 165)], fill="#EEEEEE", width=2)
 
     # ----------------------------------
-    # 4. 核心数据卡片
+    # 4. 核心数据卡片 (底框与标题)
     # ----------------------------------
-    card_y_start = 200
-    card_height = 160
-
     # 左卡片
-    draw.rounded_rectangle([(40, card_y_start), (380, card_y_start + card_height)], radius=15, fill="#FFF5F5",
+    draw.rounded_rectangle([(40, CARD_Y_START), (380, CARD_Y_START + CARD_HEIGHT)], radius=15, fill="#FFF5F5",
                            outline="#FFDCDC", width=2)
-    draw.text((70, card_y_start + 25), "主导体质", font=font_card_label, fill="#888888")
-    text_w = draw.textlength(main_diagnosis, font=font_card_val)
-    draw.text((210 - text_w / 2, card_y_start + 65), main_diagnosis, font=font_card_val, fill="#FF4B4B")
+    draw.text((70, CARD_Y_START + 25), "主导体质", font=font_card_label, fill="#888888")
 
     # 右卡片
-    draw.rounded_rectangle([(420, card_y_start), (760, card_y_start + card_height)], radius=15, fill="#F0F9FF",
+    draw.rounded_rectangle([(420, CARD_Y_START), (760, CARD_Y_START + CARD_HEIGHT)], radius=15, fill="#F0F9FF",
                            outline="#D0EFFF", width=2)
-    draw.text((450, card_y_start + 25), "MBTI 人格", font=font_card_label, fill="#888888")
-    text_w = draw.textlength(mbti, font=font_card_val)
-    draw.text((590 - text_w / 2, card_y_start + 65), mbti, font=font_card_val, fill="#0099CC")
+    draw.text((450, CARD_Y_START + 25), "MBTI 人格", font=font_card_label, fill="#888888")
 
     # ----------------------------------
-    # 5. 可视化区域
+    # 5. 雷达图背景 (手绘版)
     # ----------------------------------
-    viz_y_start = 400
-
-    # >>> 左侧：MBTI 图片 <<<
-    mbti_img_path = f"assets/mbti/{mbti}.png"
-    img_box_size = 360
-
-    if os.path.exists(mbti_img_path):
-        try:
-            mbti_img = Image.open(mbti_img_path).convert("RGBA")
-            mbti_img.thumbnail((img_box_size, 320))
-            # 居中计算
-            paste_x = 40 + (360 - mbti_img.width) // 2
-            paste_y = viz_y_start + (320 - mbti_img.height) // 2
-            img.paste(mbti_img, (paste_x, paste_y), mbti_img)
-        except:
-            pass
-    else:
-        draw.rounded_rectangle([(60, viz_y_start + 20), (340, viz_y_start + 300)], radius=10, outline="#F0F0F0",
-                               width=2)
-        draw.text((150, viz_y_start + 140), "No Image", font=font_card_label, fill="#CCCCCC")
-
-    # >>> 右侧：雷达图 (手绘版) <<<
-    cx, cy = 600, viz_y_start + 160
-    radius = 150
+    cx, cy = RADAR_CX, RADAR_CY
+    radius = RADAR_RADIUS
     # 背景圆
     for r_ratio in [0.25, 0.5, 0.75, 1.0]:
         r = radius * r_ratio
         draw.ellipse([(cx - r, cy - r), (cx + r, cy + r)], outline="#EEEEEE", width=2)
 
     # 轴线
-    angles = [-90, -18, 54, 126, 198]
     labels = ['木', '火', '土', '金', '水']
-    for i, angle in enumerate(angles):
+    for i, angle in enumerate(RADAR_ANGLES):
         rad_angle = math.radians(angle)
         end_x = cx + radius * math.cos(rad_angle)
         end_y = cy + radius * math.sin(rad_angle)
@@ -256,13 +302,142 @@ def generate_share_image(main_diagnosis, mbti, scores, elements):
         tw = draw.textlength(txt, font=font_radar)
         draw.text((lx - tw / 2, ly - 15), txt, font=font_radar, fill="#555555")
 
-    # 数据点连线
+    draw.text((cx - 70, cy + 180), "五行能量雷达", font=font_card_label, fill="#AAAAAA")
+
+    # ----------------------------------
+    # 6. 完整体质得分列表标题
+    # ----------------------------------
+    draw.line([(40, LIST_Y_START), (760, LIST_Y_START)], fill="#EEEEEE", width=2)
+    draw.text((40, LIST_Y_START + 30), "完整体质得分 (Constitution Scores)", font=font_section, fill="#333333")
+
+    # ----------------------------------
+    # 7. 底部互动区域 (真实二维码 + 标语)
+    # ----------------------------------
+    footer_start_y = FOOTER_START_Y
+    draw.line([(40, footer_start_y), (760, footer_start_y)], fill="#EEEEEE", width=2)
+
+    # >>> 真实二维码生成 <<<
+    qr_size = 140
+    qr_x, qr_y = 50, footer_start_y + 35
+
+    # 生成 QR 图片
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=10,
+        border=1,
+    )
+    qr.add_data(SHARE_URL)
+    qr.make(fit=True)
+    qr_img = qr.make_image(fill_color="black", back_color="white")
+    qr_img = qr_img.resize((qr_size, qr_size))
+
+    # 粘贴二维码
+    img.paste(qr_img, (qr_x, qr_y))
+    # 绘制边框
+    draw.rectangle([(qr_x - 2, qr_y - 2), (qr_x + qr_size + 2, qr_y + qr_size + 2)], outline="#DDDDDD", width=1)
+
+    # 二维码下方文字
+    qr_text = "长按识别体验"
+    try:
+        qw = draw.textlength(qr_text, font=font_qr_label)
+    except:
+        qw = 100
+    draw.text((qr_x + (qr_size - qw) / 2, qr_y + qr_size + 10), qr_text, font=font_qr_label, fill="#888888")
+
+    # >>> 右侧信息区 <<<
+    text_left_x = 220
+
+    # 分享标语
+    slogan_y = footer_start_y + 40
+    slogan_text = "快来测测你的\n中医学 MBTI 人格吧~"
+    draw.text((text_left_x, slogan_y), slogan_text, font=font_slogan, fill="#FF4B4B", spacing=12)
+
+    # 免责声明
+    disclaimer_y = slogan_y + 100
+    disclaimer_text = "声明：本测试结果未经医学论证，无临床诊断意义。\n如有身体不适，请前往正规医院就诊。"
+    draw.text((text_left_x, disclaimer_y), disclaimer_text, font=font_disclaimer, fill="#999999", spacing=6)
+
+    # 版权信息
+    copyright_y = disclaimer_y + 60
+    copyright_text = "Generated by Cyber NJ AI System  |  2026 Edition"
+    draw.text((text_left_x, copyright_y), copyright_text, font=font_copyright, fill="#CCCCCC")
+
+    return img
+
+
+def _get_poster_base():
+    """静态底图只绘制一次，之后每次返回同一张 (调用方需 copy 后再画)"""
+    global _poster_base
+    if _poster_base is None:
+        with _poster_base_lock:
+            if _poster_base is None:
+                _poster_base = _build_poster_base()
+    return _poster_base
+
+
+@timed("generate_share_image")
+def generate_share_image(main_diagnosis, mbti, scores, elements):
+    """
+    绘制包含 MBTI 图片、五行雷达图、完整得分、真实二维码和免责声明的诊断单
+    (静态部分来自缓存底图，这里只绘制随结果变化的内容)
+    """
+    # ----------------------------------
+    # 1. 画布：复制静态底图
+    # ----------------------------------
+    img = _get_poster_base().copy()
+    draw = ImageDraw.Draw(img)
+
+    # ----------------------------------
+    # 2. 字体 (从进程级字体注册表取，不再每次加载)
+    # ----------------------------------
+    font_card_label = get_font(26)
+    font_card_val = get_font(72)
+    font_list_name = get_font(32)
+    font_list_score = get_font(28)
+
+    # ----------------------------------
+    # 4. 核心数据卡片 (数值)
+    # ----------------------------------
+    card_y_start = CARD_Y_START
+
+    # 左卡片
+    text_w = draw.textlength(main_diagnosis, font=font_card_val)
+    draw.text((210 - text_w / 2, card_y_start + 65), main_diagnosis, font=font_card_val, fill="#FF4B4B")
+
+    # 右卡片
+    text_w = draw.textlength(mbti, font=font_card_val)
+    draw.text((590 - text_w / 2, card_y_start + 65), mbti, font=font_card_val, fill="#0099CC")
+
+    # ----------------------------------
+    # 5. 可视化区域
+    # ----------------------------------
+    viz_y_start = VIZ_Y_START
+
+    # >>> 左侧：MBTI 图片 (已解码缩放的缓存) <<<
+    mbti_asset = get_mbti_asset(mbti)
+
+    if mbti_asset is not None:
+        mbti_img = mbti_asset.poster
+        if mbti_img is not None:
+            # 居中计算
+            paste_x = 40 + (360 - mbti_img.width) // 2
+            paste_y = viz_y_start + (320 - mbti_img.height) // 2
+            img.paste(mbti_img, (paste_x, paste_y), mbti_img)
+    else:
+        draw.rounded_rectangle([(60, viz_y_start + 20), (340, viz_y_start + 300)], radius=10, outline="#F0F0F0",
+                               width=2)
+        draw.text((150, viz_y_start + 140), "No Image", font=font_card_label, fill="#CCCCCC")
+
+    # >>> 右侧：雷达图数据点连线 (背景圆与轴线在底图中) <<<
+    cx, cy = RADAR_CX, RADAR_CY
+    radius = RADAR_RADIUS
     data_points = []
     element_order = ['木', '火', '土', '金', '水']
     for i, ele in enumerate(element_order):
         val = elements.get(ele, 0)
         ratio = min(val / 100.0, 1.0)
-        rad_angle = math.radians(angles[i])
+        rad_angle = math.radians(RADAR_ANGLES[i])
         px = cx + radius * ratio * math.cos(rad_angle)
         py = cy + radius * ratio * math.sin(rad_angle)
         data_points.append((px, py))
@@ -272,14 +447,10 @@ def generate_share_image(main_diagnosis, mbti, scores, elements):
         for px, py in data_points:
             draw.ellipse([(px - 6, py - 6), (px + 6, py + 6)], fill="#FFFFFF", outline="#FF4B4B", width=3)
 
-    draw.text((cx - 70, cy + 180), "五行能量雷达", font=font_card_label, fill="#AAAAAA")
-
     # ----------------------------------
     # 6. 完整体质得分列表 (修复溢出问题)
     # ----------------------------------
-    list_y_start = 800
-    draw.line([(40, list_y_start), (760, list_y_start)], fill="#EEEEEE", width=2)
-    draw.text((40, list_y_start + 30), "完整体质得分 (Constitution Scores)", font=font_section, fill="#333333")
+    list_y_start = LIST_Y_START
 
     sorted_scores = sorted(scores.items(), key=lambda x: x[1], reverse=True)
 
@@ -329,60 +500,63 @@ def generate_share_image(main_diagnosis, mbti, scores, elements):
 
         # 4. "分"字位置：紧跟在数字后面
         num_w = draw.textlength(val_str, font=font_list_score)
-        unit_font = ImageFont.truetype(valid_font, 20)  # 单独定义小字体
+        unit_font = get_font(20)  # 单独定义小字体
         draw.text((score_x + num_w + 2, curr_y + 4), "分", font=unit_font, fill="#999999")
 
-    # ----------------------------------
-    # 7. 底部互动区域 (真实二维码 + 标语)
-    # ----------------------------------
-    footer_start_y = 1260
-    draw.line([(40, footer_start_y), (760, footer_start_y)], fill="#EEEEEE", width=2)
-
-    # >>> 真实二维码生成 <<<
-    qr_size = 140
-    qr_x, qr_y = 50, footer_start_y + 35
-
-    # 生成 QR 图片
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=1,
-    )
-    qr.add_data(SHARE_URL)
-    qr.make(fit=True)
-    qr_img = qr.make_image(fill_color="black", back_color="white")
-    qr_img = qr_img.resize((qr_size, qr_size))
+    return img
 
-    # 粘贴二维码
-    img.paste(qr_img, (qr_x, qr_y))
-    # 绘制边框
-    draw.rectangle([(qr_x - 2, qr_y - 2), (qr_x + qr_size + 2, qr_y + qr_size + 2)], outline="#DDDDDD", width=1)
 
-    # 二维码下方文字
-    qr_text = "长按识别体验"
-    try:
-        qw = draw.textlength(qr_text, font=font_qr_label)
-    except:
-        qw = 100
-    draw.text((qr_x + (qr_size - qw) / 2, qr_y + qr_size + 10), qr_text, font=font_qr_label, fill="#888888")
+# ==========================================
+# 5. 海报 PNG 缓存 (按结果内容做 LRU，按内存上限淘汰)
+# ==========================================
+POSTER_CACHE_MAX_BYTES = int(os.environ.get("CYBERNJ_POSTER_CACHE_MB", "64")) * 1024 * 1024
 
-    # >>> 右侧信息区 <<<
-    text_left_x = 220
+_poster_cache = OrderedDict()  # key -> png bytes
+_poster_cache_bytes = 0
+_poster_cache_lock = threading.Lock()
+_poster_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
 
-    # 分享标语
-    slogan_y = footer_start_y + 40
-    slogan_text = "快来测测你的\n中医学 MBTI 人格吧~"
-    draw.text((text_left_x, slogan_y), slogan_text, font=font_slogan, fill="#FF4B4B", spacing=12)
 
-    # 免责声明
-    disclaimer_y = slogan_y + 100
-    disclaimer_text = "声明：本测试结果未经医学论证，无临床诊断意义。\n如有身体不适，请前往正规医院就诊。"
-    draw.text((text_left_x, disclaimer_y), disclaimer_text, font=font_disclaimer, fill="#999999", spacing=6)
+def _poster_cache_key(main_diagnosis, mbti, scores, elements):
+    # 保留字典顺序：同分时得分列表的排列依赖插入顺序
+    return main_diagnosis, mbti, tuple(scores.items()), tuple(elements.items())
 
-    # 版权信息
-    copyright_y = disclaimer_y + 60
-    copyright_text = "Generated by Cyber NJ AI System  |  2026 Edition"
-    draw.text((text_left_x, copyright_y), copyright_text, font=font_copyright, fill="#CCCCCC")
 
-    return img
\ No newline at end of file
+def render_share_png(main_diagnosis, mbti, scores, elements):
+    """
+    返回诊断海报的 PNG 字节串；相同结果直接命中缓存，不再重新绘制和编码
+    """
+    global _poster_cache_bytes
+    key = _poster_cache_key(main_diagnosis, mbti, scores, elements)
+
+    with _poster_cache_lock:
+        png = _poster_cache.get(key)
+        if png is not None:
+            _poster_cache.move_to_end(key)
+            _poster_cache_stats["hits"] += 1
+            return png
+        _poster_cache_stats["misses"] += 1
+
+    # 绘制放在锁外，避免阻塞其他会话
+    buf = BytesIO()
+    generate_share_image(main_diagnosis, mbti, scores, elements).save(buf, format="PNG")
+    png = buf.getvalue()
+
+    if len(png) > POSTER_CACHE_MAX_BYTES:
+        return png
+
+    with _poster_cache_lock:
+        if key not in _poster_cache:
+            _poster_cache[key] = png
+            _poster_cache_bytes += len(png)
+        while _poster_cache_bytes > POSTER_CACHE_MAX_BYTES:
+            _, evicted = _poster_cache.popitem(last=False)
+            _poster_cache_bytes -= len(evicted)
+            _poster_cache_stats["evictions"] += 1
+    return png
+
+
+def poster_cache_info():
+    """缓存统计：命中/未命中/淘汰次数、条目数与占用字节"""
+    with _poster_cache_lock:
+        return dict(_poster_cache_stats, entries=len(_poster_cache), bytes=_poster_cache_bytes)
\ No newline at end of file